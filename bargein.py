@@ -0,0 +1,278 @@
+# ==============================================================================
+# bargein.py
+# ------------------------------------------------------------------------------
+# This module lets the user interrupt ("barge in" on) a long spoken response.
+# While the assistant is speaking, a monitor thread watches the microphone for
+# voice activity. When the user starts talking, speech output stops at the next
+# word, and the user's utterance is recorded and sent straight to recognition,
+# so they don't have to wait for the response to finish and then repeat it.
+#
+# The microphone also hears the assistant's own voice, so speak() reports when
+# it is playing, and the first frames of playback are used to learn how loud
+# that echo is. Only speech well above the echo counts as the user talking.
+#
+# The monitor reads raw audio frames from any iterable, so it can be driven by
+# the microphone or by a simulated audio stream.
+# ==============================================================================
+
+import re
+import threading
+import collections
+
+import numpy as np
+import speech_recognition as sr
+
+from speak import speak
+from listen import recognize
+from config import (
+    BARGE_IN_RATIO, BARGE_IN_MIN_ENERGY, BARGE_IN_TRIGGER_FRAMES, BARGE_IN_ECHO_FRAMES,
+    BARGE_IN_END_SILENCE, BARGE_IN_PHRASE_LIMIT
+)
+
+# Interruptions that only ask the assistant to stop talking. Speech has already
+# stopped by the time they are recognized, so they are not passed on as a
+# command (a bare "stop" would otherwise be routed to pause_music).
+_STOP_SPEAKING = re.compile(
+    r"(?:(?:ok|okay|please|alright) )*"
+    r"(?:stop|stop it|stop talking|stop there|enough|that's enough|quiet|be quiet|shut up|shush)"
+    r"(?: (?:please|now|thanks|thank you))*"
+)
+
+# NumPy sample types for each PCM sample width
+_SAMPLE_TYPES = {1: np.int8, 2: np.dtype("<i2"), 4: np.dtype("<i4")}
+
+def rms(frame, sample_width):
+    """Returns the RMS energy of raw PCM audio, on the scale of its samples."""
+    if sample_width == 3:
+        # NumPy has no 24-bit type, so widen each sample to 32 bits
+        raw = np.frombuffer(frame, dtype=np.uint8, count=len(frame) // 3 * 3).reshape(-1, 3)
+        widened = np.zeros((len(raw), 4), dtype=np.uint8)
+        widened[:, 1:] = raw
+        samples = widened.view("<i4").reshape(-1) >> 8
+    else:
+        samples = np.frombuffer(frame, dtype=_SAMPLE_TYPES[sample_width],
+                                count=len(frame) // sample_width)
+    if len(samples) == 0:
+        return 0
+    return int(np.sqrt(np.mean(np.square(samples, dtype=np.float64))))
+
+class VoiceActivityDetector:
+    """
+    A simple energy-based voice activity detector with echo suppression.
+
+    It tracks a running noise floor from frames that are not speech. While the
+    assistant is talking, its own voice leaks back into the microphone, so the
+    first `echo_frames` frames of playback are used to learn an echo floor
+    (the loudest of them, since the echo rises and falls with each word), and
+    nothing counts as speech until it has been learned. During playback,
+    speech has to be well above the echo floor too, for several frames in a row.
+    """
+
+    def __init__(self, ratio=BARGE_IN_RATIO, min_energy=BARGE_IN_MIN_ENERGY,
+                 trigger_frames=BARGE_IN_TRIGGER_FRAMES, echo_frames=BARGE_IN_ECHO_FRAMES,
+                 floor_decay=0.9):
+        """
+        Args:
+            ratio (float): How many times louder than the noise floor speech must be.
+            min_energy (int): An absolute RMS energy that speech must also exceed.
+            trigger_frames (int): Consecutive speech frames needed to confirm speech.
+            echo_frames (int): Frames of playback used to learn the echo floor.
+            floor_decay (float): Smoothing factor for the noise and echo floors (0-1).
+        """
+        self.ratio = ratio
+        self.min_energy = min_energy
+        self.trigger_frames = trigger_frames
+        self.echo_frames = echo_frames
+        self.floor_decay = floor_decay
+        self.noise_floor = None
+        self.echo_floor = None
+        self._echo_seen = 0
+        self._speech_run = 0
+
+    def is_speech(self, energy, playing=False):
+        """
+        Returns True if a frame with this energy is loud enough to be speech.
+
+        Args:
+            energy (int): The frame's RMS energy.
+            playing (bool): Whether the assistant was speaking during the frame.
+        """
+        if self.noise_floor is None:
+            self.noise_floor = energy
+        floor = self.noise_floor
+        if playing and self.echo_floor is not None:
+            floor = max(floor, self.echo_floor)
+        return energy > self.min_energy and energy > floor * self.ratio
+
+    def update(self, frame, sample_width, playing=False):
+        """
+        Feeds one frame to the detector.
+
+        Args:
+            frame (bytes): Raw PCM audio.
+            sample_width (int): Bytes per sample.
+            playing (bool): Whether the assistant was speaking during the frame.
+
+        Returns:
+            bool: True once enough consecutive speech frames have been seen.
+        """
+        energy = rms(frame, sample_width)
+        if playing and self._echo_seen < self.echo_frames:
+            # Still learning how loud the assistant's own voice is
+            self._echo_seen += 1
+            self.echo_floor = max(self.echo_floor or 0, energy)
+            self._speech_run = 0
+            return False
+
+        if self.is_speech(energy, playing):
+            self._speech_run += 1
+        elif playing:
+            self._speech_run = 0
+            # The echo floor can creep up if playback gets louder, but never
+            # drops in the pauses between words
+            smoothed = self.floor_decay * self.echo_floor + (1 - self.floor_decay) * energy
+            self.echo_floor = max(self.echo_floor, smoothed)
+        else:
+            self._speech_run = 0
+            # Only non-speech frames without playback (ambient noise) move the noise floor
+            self.noise_floor = self.floor_decay * self.noise_floor + (1 - self.floor_decay) * energy
+        return self._speech_run >= self.trigger_frames
+
+class BargeInMonitor:
+    """
+    Watches an audio stream for the user starting to speak, then records them.
+
+    Usage: start() the monitor, pass `triggered` to speak() as its interrupt
+    event, then stop() and join() it. If the user barged in, `audio` holds
+    their utterance as an sr.AudioData.
+    """
+
+    def __init__(self, frames=None, sample_rate=16000, sample_width=2, playing=None):
+        """
+        Args:
+            frames (iterable[bytes]): Raw PCM frames to monitor. If omitted, the
+                default microphone is opened and its settings are used.
+            sample_rate (int): Sample rate of `frames`, in Hz.
+            sample_width (int): Bytes per sample of `frames`.
+            playing (threading.Event): Set while the assistant's voice is being
+                played (see speak()). Defaults to an event that is never set.
+        """
+        self.frames = frames
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.playing = playing or threading.Event()
+        self.triggered = threading.Event()
+        self.audio = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """Stops waiting for speech. A recording already in progress is finished."""
+        self._stopped.set()
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            if self.frames is not None:
+                self._consume(iter(self.frames))
+                return
+            with sr.Microphone() as source:
+                self.sample_rate = source.SAMPLE_RATE
+                self.sample_width = source.SAMPLE_WIDTH
+                self._consume(iter(lambda: source.stream.read(source.CHUNK), b""))
+        except Exception as e:
+            print(f"Barge-in monitor error: {e}")
+
+    def _consume(self, frames):
+        """Waits for speech onset, then records until the user stops talking."""
+        vad = VoiceActivityDetector()
+        bytes_per_second = self.sample_rate * self.sample_width
+        # Keep a short pre-roll so the start of the first word isn't lost
+        preroll = collections.deque()
+        preroll_bytes = 0
+
+        # --- Phase 1: wait for the user to start talking ---
+        for frame in frames:
+            if self._stopped.is_set():
+                return
+            preroll.append(frame)
+            preroll_bytes += len(frame)
+            while preroll_bytes - len(preroll[0]) > bytes_per_second * 0.5:
+                preroll_bytes -= len(preroll.popleft())
+            if vad.update(frame, self.sample_width, self.playing.is_set()):
+                self.triggered.set()
+                break
+        else:
+            return
+
+        # --- Phase 2: record until a pause or the phrase limit ---
+        self.audio = record_phrase(frames, vad, list(preroll), self.sample_rate, self.sample_width)
+
+def record_phrase(frames, vad, recorded, sample_rate, sample_width):
+    """
+    Records the rest of an utterance once speech has started.
+
+    Recording stops after BARGE_IN_END_SILENCE seconds of silence or at
+    BARGE_IN_PHRASE_LIMIT seconds. Also used by the idle monitor (see idle.py).
+
+    Args:
+        frames (iterator[bytes]): The audio stream, positioned after the onset.
+        vad (VoiceActivityDetector): The detector that saw the onset.
+        recorded (list[bytes]): Frames already captured (the pre-roll).
+        sample_rate (int): Sample rate of the frames, in Hz.
+        sample_width (int): Bytes per sample.
+
+    Returns:
+        sr.AudioData: The whole utterance.
+    """
+    bytes_per_second = sample_rate * sample_width
+    total_bytes = sum(len(frame) for frame in recorded)
+    silent_bytes = 0
+    for frame in frames:
+        recorded.append(frame)
+        total_bytes += len(frame)
+        if vad.is_speech(rms(frame, sample_width)):
+            silent_bytes = 0
+        else:
+            silent_bytes += len(frame)
+        if silent_bytes >= bytes_per_second * BARGE_IN_END_SILENCE:
+            break
+        if total_bytes >= bytes_per_second * BARGE_IN_PHRASE_LIMIT:
+            break
+    return sr.AudioData(b"".join(recorded), sample_rate, sample_width)
+
+def speak_with_barge_in(text, frames=None, rescore=True):
+    """
+    Speaks a response, stopping early if the user starts talking over it.
+
+    Args:
+        text (str or iterable[str]): The response to speak, or a stream of sentences.
+        frames (iterable[bytes]): Optional simulated audio stream (16 kHz,
+            16-bit) to monitor instead of the microphone.
+        rescore (bool): Whether an interruption is expected to be a command
+            (see listen.listen()).
+
+    Returns:
+        str or None: What the user said if they interrupted, otherwise None.
+        None too if all they said was to stop talking (e.g. "stop").
+    """
+    playing = threading.Event()
+    monitor = BargeInMonitor(frames, playing=playing)
+    monitor.start()
+    speak(text, interrupt=monitor.triggered, playing=playing)
+    # If the user started talking, even during the last word, let the
+    # recording finish; otherwise stop monitoring
+    if not monitor.triggered.is_set():
+        monitor.stop()
+    monitor.join(BARGE_IN_PHRASE_LIMIT + 1)
+    if monitor.audio is None:
+        return None
+    interruption = recognize(monitor.audio, rescore=rescore)
+    if interruption and _STOP_SPEAKING.fullmatch(interruption.lower().strip()):
+        return None
+    return interruption
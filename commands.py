@@ -12,54 +12,159 @@ import os
 import time
 import pyjokes
 import spotipy
+import sqlite3
 import smtplib
 import requests
 import datetime
 import wikipedia
-import pyautogui
 import threading
 import webbrowser
+import screenshot
+import song_cache
+import history
 from speak import speak
-from listen import listen
 import shared_state
 import screen_brightness_control as sbc
-from comtypes import CLSCTX_ALL
 from ctypes import cast, POINTER
 from email.message import EmailMessage
 from spotipy.oauth2 import SpotifyOAuth
-from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
+
+# Volume control uses Windows-only COM libraries. On other systems (such as a
+# Linux benchmark machine) the rest of the commands still work and set_volume
+# reports that the feature is unavailable.
+try:
+    from comtypes import CLSCTX_ALL
+    from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
+except (ImportError, OSError):
+    AudioUtilities = None
 
 # Import configuration variables from config.py
 from config import (
     NEWS_API_KEY, WEATHER_API_KEY, SPOTIPY_CLIENT_ID, SPOTIPY_CLIENT_SECRET,
-    SPOTIPY_REDIRECT_URI, APP_PATHS, WEBSITE_URLS, TODO_FILE, EMAIL_ACCOUNTS, CONTACTS
+    SPOTIPY_REDIRECT_URI, APP_PATHS, WEBSITE_URLS, TODO_FILE,
+    SCREENSHOT_BURST_MAX, RESPONSE_CACHE_SECONDS, SPOTIFY_PREFETCH_LIBRARY,
+    WEATHER_API_URL, NEWS_API_URL, WIKIPEDIA_API_URL, SPOTIFY_API_URL, SPOTIFY_ACCESS_TOKEN,
+    SMTP_HOST, SMTP_PORT, SMTP_USE_SSL, REQUEST_TIMEOUT
 )
 
+# The wikipedia library keeps its endpoint in a module-level variable
+wikipedia.wikipedia.API_URL = WIKIPEDIA_API_URL
+
+# A single HTTP session is shared by all commands so that connections to the
+# weather and news services are kept alive and reused between requests
+_http = requests.Session()
+
+# The Spotify client is created once and then reused (see _get_spotify_client)
+_spotify_client = None
+_spotify_lock = threading.Lock()
+
+# Recent successful API responses, keyed by (service, parameter).
+# Each value is a (time fetched, response) pair.
+_response_cache = {}
+_cache_lock = threading.Lock()
+
 # --- Helper Functions ---
 
+def _cache_get(key):
+    """Returns a cached response if it is younger than RESPONSE_CACHE_SECONDS, otherwise None."""
+    with _cache_lock:
+        entry = _response_cache.get(key)
+    if entry and time.monotonic() - entry[0] < RESPONSE_CACHE_SECONDS:
+        return entry[1]
+    return None
+
+def _cache_put(key, response):
+    """Stores a successful response in the cache."""
+    with _cache_lock:
+        _response_cache[key] = (time.monotonic(), response)
+
 def _get_spotify_client():
     """
     Authenticates with the Spotify API and returns a client object.
-    Handles OAuth 2.0 flow for user authorization.
+    Handles OAuth 2.0 flow for user authorization. The client is created on
+    the first call and reused afterwards.
 
     Returns:
         spotipy.Spotify or None: An authenticated Spotify client object, or None if authentication fails.
         str or None: An error message if something goes wrong.
     """
+    global _spotify_client
     try:
-        # Set up the authentication manager with credentials from the config file
-        auth_manager = SpotifyOAuth(
-            client_id=SPOTIPY_CLIENT_ID,
-            client_secret=SPOTIPY_CLIENT_SECRET,
-            redirect_uri=SPOTIPY_REDIRECT_URI,
-            scope="user-modify-playback-state user-read-playback-state"
-        )
-        # Create and return the Spotify client
-        return spotipy.Spotify(auth_manager=auth_manager), None
+        with _spotify_lock:
+            if _spotify_client is None and SPOTIFY_ACCESS_TOKEN:
+                # A fixed token (e.g. for the simulator) skips the OAuth flow
+                _spotify_client = spotipy.Spotify(auth=SPOTIFY_ACCESS_TOKEN, requests_timeout=REQUEST_TIMEOUT)
+                _spotify_client.prefix = SPOTIFY_API_URL
+            if _spotify_client is None:
+                scope = "user-modify-playback-state user-read-playback-state"
+                # Reading the library to pre-fill the song cache needs extra permissions
+                if SPOTIFY_PREFETCH_LIBRARY:
+                    scope += " user-library-read user-top-read"
+                # Set up the authentication manager with credentials from the config file
+                auth_manager = SpotifyOAuth(
+                    client_id=SPOTIPY_CLIENT_ID,
+                    client_secret=SPOTIPY_CLIENT_SECRET,
+                    redirect_uri=SPOTIPY_REDIRECT_URI,
+                    scope=scope
+                )
+                # Create the Spotify client
+                _spotify_client = spotipy.Spotify(auth_manager=auth_manager, requests_timeout=REQUEST_TIMEOUT)
+                _spotify_client.prefix = SPOTIFY_API_URL
+        return _spotify_client, None
     except Exception as e:
         print(f"Spotify Authentication Error: {e}")
         return None, "Could not connect to Spotify. Please check your credentials in config.py."
 
+def warm_spotify():
+    """
+    Creates the Spotify client and refreshes its access token ahead of time.
+
+    This never starts the interactive OAuth flow: if the user has not
+    authorized the app yet, it does nothing.
+
+    Returns:
+        bool: True if a valid access token is now cached.
+    """
+    sp, error_msg = _get_spotify_client()
+    if error_msg:
+        return False
+    if sp.auth_manager is None:
+        # Using a fixed access token, so there is nothing to refresh
+        return True
+    token = sp.auth_manager.cache_handler.get_cached_token()
+    if not token:
+        return False
+    # Refreshes the token if it has expired
+    return sp.auth_manager.validate_token(token) is not None
+
+def warm_song_cache(song_names=()):
+    """
+    Fills the song cache ahead of time so that likely songs play without a search.
+
+    Refreshes the library index if SPOTIFY_PREFETCH_LIBRARY is on and the index
+    is out of date, then resolves any of `song_names` that are not cached yet.
+
+    Args:
+        song_names (iterable[str]): Song names the user is likely to ask for.
+
+    Returns:
+        int: The number of songs newly resolved by search.
+    """
+    if not warm_spotify():
+        return 0
+    sp, _ = _get_spotify_client()
+    if SPOTIFY_PREFETCH_LIBRARY and song_cache.index_is_stale():
+        song_cache.prefetch_library(sp)
+    resolved = 0
+    for song_name in song_names:
+        if song_cache.lookup(song_name):
+            continue
+        results = sp.search(q=song_name, limit=1, type='track')
+        if results['tracks']['items']:
+            song_cache.remember(song_name, results['tracks']['items'][0]['uri'])
+            resolved += 1
+    return resolved
+
 def _get_active_device(sp):
     """
     Finds the user's currently active Spotify device.
@@ -82,6 +187,10 @@ def _get_active_device(sp):
         print(f"Spotify Device Error: {e}")
         return None, "Could not find an active Spotify device."
 
+# Held while the to-do file is read or rewritten, so sessions running at the
+# same time (see sessions.py) can't lose each other's changes
+_todo_lock = threading.Lock()
+
 def _read_todos():
     """Reads all tasks from the to-do list file."""
     if not os.path.exists(TODO_FILE):
@@ -125,25 +234,32 @@ def add_todo(task):
     """
     if not task:
         return "I didn't hear a task to add."
-    tasks = _read_todos()
-    tasks.append(task)
-    _write_todos(tasks)
+    with _todo_lock:
+        tasks = _read_todos()
+        tasks.append(task)
+        _write_todos(tasks)
     return f"Added '{task}' to your to-do list."
 
 def show_todos():
     """
-    Reads and returns the current to-do list.
+    Reads the current to-do list.
 
-    Returns:
-        str: A spoken summary of the to-do list.
+    This is a generator, so speech can start with the first task while the
+    rest of the list is still being read out.
+
+    Yields:
+        str: The spoken summary of the to-do list, one sentence at a time.
     """
-    tasks = _read_todos()
+    with _todo_lock:
+        tasks = _read_todos()
     if not tasks:
-        return "Your to-do list is empty."
+        yield "Your to-do list is empty."
+        return
     
-    # Create a numbered list for the spoken response
-    task_list_str = ". ".join(f"Task {i+1}: {t}" for i, t in enumerate(tasks))
-    return f"Here is your to-do list: {task_list_str}"
+    # Read out a numbered list, one task per sentence
+    yield "Here is your to-do list."
+    for i, t in enumerate(tasks):
+        yield f"Task {i+1}: {t}."
 
 def complete_todo(task_number_str):
     """
@@ -157,14 +273,15 @@ def complete_todo(task_number_str):
     """
     try:
         task_number = int(task_number_str)
-        tasks = _read_todos()
-        # Check if the task number is valid
-        if 0 < task_number <= len(tasks):
-            removed_task = tasks.pop(task_number - 1)
-            _write_todos(tasks)
-            return f"Completed and removed task: {removed_task}"
-        else:
-            return "That task number is not on your list."
+        with _todo_lock:
+            tasks = _read_todos()
+            # Check if the task number is valid
+            if 0 < task_number <= len(tasks):
+                removed_task = tasks.pop(task_number - 1)
+                _write_todos(tasks)
+                return f"Completed and removed task: {removed_task}"
+            else:
+                return "That task number is not on your list."
     except (ValueError, TypeError):
         return "Sorry, I didn't understand the task number."
     except Exception as e:
@@ -201,6 +318,10 @@ def search_wikipedia(query):
         return f"Sorry, I could not find any results for '{query}' on Wikipedia."
     except wikipedia.exceptions.DisambiguationError:
         return f"'{query}' could refer to multiple things. Please be more specific."
+    except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+        # Network failures, or an error page instead of the expected JSON
+        print(f"Wikipedia Error: {e}")
+        return "Could not connect to Wikipedia."
 
 def get_weather(city="Bhopal"):
     """
@@ -214,9 +335,12 @@ def get_weather(city="Bhopal"):
     """
     if not WEATHER_API_KEY or "YOUR_" in WEATHER_API_KEY:
         return "Weather API key is not configured in config.py."
-    base_url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={WEATHER_API_KEY}&units=metric"
+    cached = _cache_get(("weather", city.lower()))
+    if cached:
+        return cached
+    params = {"q": city, "appid": WEATHER_API_KEY, "units": "metric"}
     try:
-        response = requests.get(base_url)
+        response = _http.get(WEATHER_API_URL, params=params, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
         data = response.json()
         
@@ -224,7 +348,9 @@ def get_weather(city="Bhopal"):
         weather = data["weather"][0]
         temperature = main["temp"]
         description = weather["description"]
-        return f"The temperature in {city} is {temperature} degrees Celsius with {description}."
+        report = f"The temperature in {city} is {temperature} degrees Celsius with {description}."
+        _cache_put(("weather", city.lower()), report)
+        return report
     except requests.exceptions.HTTPError:
         return f"Could not find weather data for {city}. Please check the city name."
     except requests.exceptions.RequestException:
@@ -234,25 +360,37 @@ def get_news():
     """
     Fetches the top 5 news headlines from India using the NewsAPI.
 
-    Returns:
-        str: A summary of the top headlines or an error message.
+    This is a generator, so speech can start with the first headline while
+    the rest are still being produced.
+
+    Yields:
+        str: The headlines (or an error message), one sentence at a time.
     """
     if not NEWS_API_KEY or "YOUR_" in NEWS_API_KEY:
-        return "News API key is not configured in config.py."
-    base_url = f"https://newsapi.org/v2/top-headlines?country=in&apiKey={NEWS_API_KEY}"
-    try:
-        response = requests.get(base_url)
-        response.raise_for_status()
-        data = response.json()
+        yield "News API key is not configured in config.py."
+        return
+    headlines = _cache_get(("news", None))
+    if not headlines:
+        params = {"country": "in", "apiKey": NEWS_API_KEY}
+        try:
+            response = _http.get(NEWS_API_URL, params=params, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            data = response.json()
+        except requests.exceptions.RequestException:
+            yield "Could not connect to the news service."
+            return
         articles = data.get("articles", [])
         if not articles:
-            return "Sorry, I couldn't fetch the news right now."
+            yield "Sorry, I couldn't fetch the news right now."
+            return
         
         # Get the titles of the top 5 articles
         headlines = [article['title'] for article in articles[:5]]
-        return "Here are the top news headlines: " + ". ".join(headlines)
-    except requests.exceptions.RequestException:
-        return "Could not connect to the news service."
+        _cache_put(("news", None), headlines)
+
+    yield "Here are the top news headlines."
+    for headline in headlines:
+        yield f"{headline}."
 
 def open_app(app_name):
     """
@@ -327,18 +465,30 @@ def play_song(song_name):
     """
     sp, error_msg = _get_spotify_client()
     if error_msg: return error_msg
+
+    # Known songs start with a single call on the currently active device.
+    # If that fails (e.g. no device is active), fall back to the full lookup.
+    track_uri = song_cache.lookup(song_name)
+    if track_uri:
+        try:
+            sp.start_playback(uris=[track_uri])
+            return f"Playing {song_name} on Spotify..."
+        except spotipy.SpotifyException as e:
+            print(f"Spotify Playback Error: {e}")
     
     device_id, error_msg = _get_active_device(sp)
     if error_msg: return error_msg
     
     # Search for the track on Spotify
-    results = sp.search(q=song_name, limit=1, type='track')
-    if results['tracks']['items']:
+    if not track_uri:
+        results = sp.search(q=song_name, limit=1, type='track')
+        if not results['tracks']['items']:
+            return f"Sorry, I couldn't find the song '{song_name}' on Spotify."
         track_uri = results['tracks']['items'][0]['uri']
-        sp.start_playback(device_id=device_id, uris=[track_uri])
-        return f"Playing {song_name} on Spotify..."
-    else:
-        return f"Sorry, I couldn't find the song '{song_name}' on Spotify."
+    sp.start_playback(device_id=device_id, uris=[track_uri])
+    # Remember the track so the next request for this song skips the search
+    song_cache.remember(song_name, track_uri)
+    return f"Playing {song_name} on Spotify..."
 
 def pause_music():
     """Pauses the currently playing music on Spotify."""
@@ -370,6 +520,8 @@ def set_volume(level):
     Returns:
         str: A confirmation or error message.
     """
+    if AudioUtilities is None:
+        return "I was unable to change the volume. This feature is for Windows only."
     try:
         # Get the default audio endpoint (speakers)
         devices = AudioUtilities.GetSpeakers()
@@ -399,17 +551,63 @@ def set_brightness(level):
         print(f"Brightness control error: {e}")
         return "I was unable to change the brightness."
 
-def take_screenshot():
-    """Takes a screenshot and saves it with a timestamped filename."""
+def search_history(query):
+    """
+    Answers a question about past queries, e.g. "when did I last send an email".
+
+    Args:
+        query (str): The question in lowercase.
+
+    Returns:
+        str: The answer, found through the history index (see history.py).
+    """
     try:
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        filename = f"screenshot_{timestamp}.png"
-        pyautogui.screenshot().save(filename)
-        return f"Screenshot saved as {filename}"
+        return history.answer(query)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"History Error: {e}")
+        return "Sorry, I couldn't search your history."
+
+def take_screenshot(fmt=None):
+    """
+    Takes a screenshot in the background and saves it with a timestamped filename.
+
+    If the screenshot then fails, the error is logged and the assistant says so.
+
+    Args:
+        fmt (str): Optional image format ('png', 'jpeg' or 'webp').
+
+    Returns:
+        str: A message with the filename, returned before the file is written.
+    """
+    try:
+        # Speak directly if it fails, since that happens on a background thread
+        filename, _ = screenshot.capture(fmt, on_error=speak)
+        return f"Taking a screenshot, saving it as {filename}"
     except Exception as e:
         print(f"Screenshot Error: {e}")
         return "Sorry, I couldn't take a screenshot."
 
+def take_screenshot_burst(count, interval, fmt=None):
+    """
+    Takes a series of screenshots at a fixed interval in the background.
+
+    Args:
+        count (int): The number of screenshots to take.
+        interval (int): The number of seconds between screenshots.
+        fmt (str): Optional image format ('png', 'jpeg' or 'webp').
+
+    Returns:
+        str: A confirmation or error message.
+    """
+    if not 0 < count <= SCREENSHOT_BURST_MAX:
+        return f"I can take between 1 and {SCREENSHOT_BURST_MAX} screenshots at a time."
+    try:
+        filenames, _ = screenshot.capture_burst(count, interval, fmt, on_error=speak)
+        return f"Taking {count} screenshots every {interval} seconds, starting with {filenames[0]}"
+    except Exception as e:
+        print(f"Screenshot Error: {e}")
+        return "Sorry, I couldn't start taking screenshots."
+
 def _timer_countdown(duration):
     """A helper function to run the timer countdown in a separate thread."""
     # Set the shared state flag to True so the main loop stops listening
@@ -457,31 +655,19 @@ def set_timer(duration_str):
         return "Sorry, I couldn't set the timer."
 
 def shutdown_computer():
-    """Initiates computer shutdown after confirmation."""
-    speak("Are you sure you want to shut down? Please say yes or no.")
-    if (confirmation := listen()) and "yes" in confirmation:
-        speak("Shutting down.")
-        # os.system("shutdown /s /t 1") # Uncomment to enable shutdown
-        return "Shutdown initiated by user."
-    return "Shutdown cancelled."
+    """Initiates computer shutdown. Confirmation is handled by the dialog manager."""
+    # os.system("shutdown /s /t 1") # Uncomment to enable shutdown
+    return "Shutting down."
 
 def restart_computer():
-    """Initiates computer restart after confirmation."""
-    speak("Are you sure you want to restart? Please say yes or no.")
-    if (confirmation := listen()) and "yes" in confirmation:
-        speak("Restarting.")
-        # os.system("shutdown /r /t 1") # Uncomment to enable restart
-        return "Restart initiated by user."
-    return "Restart cancelled."
+    """Initiates computer restart. Confirmation is handled by the dialog manager."""
+    # os.system("shutdown /r /t 1") # Uncomment to enable restart
+    return "Restarting."
 
 def sleep_computer():
-    """Puts the computer to sleep after confirmation."""
-    speak("Are you sure you want to put the computer to sleep? Please say yes or no.")
-    if (confirmation := listen()) and "yes" in confirmation:
-        speak("Putting computer to sleep.")
-        # os.system("rundll32.exe powrprof.dll,SetSuspendState 0,1,0") # Uncomment for Windows
-        return "Sleep mode initiated by user."
-    return "Sleep command cancelled."
+    """Puts the computer to sleep. Confirmation is handled by the dialog manager."""
+    # os.system("rundll32.exe powrprof.dll,SetSuspendState 0,1,0") # Uncomment for Windows
+    return "Putting computer to sleep."
 
 def calculate(query):
     """
@@ -516,78 +702,32 @@ def calculate(query):
         print(f"Calculation Error: {e}")
         return "Sorry, I couldn't perform that calculation."
 
-def send_email():
+def send_email(account, recipient_email, subject, body):
     """
-    Guides the user through sending an email. This is an interactive command.
-    It handles its own speaking and listening.
+    Sends an email. The details are collected by the email dialog in dialog.py.
+
+    Args:
+        account (dict): An entry from EMAIL_ACCOUNTS with 'address' and 'password'.
+        recipient_email (str): The recipient's email address.
+        subject (str): The subject line.
+        body (str): The message text.
 
     Returns:
-        str: A final status message (e.g., "Email sent" or "Email cancelled").
+        str: A final status message (e.g., "Email sent" or an error).
     """
-    speak("Starting the email process.")
-    
     try:
-        # --- Get Sender Account ---
-        speak("Which account would you like to send from?")
-        sender_keyword = listen()
-        if not sender_keyword or sender_keyword.lower() not in EMAIL_ACCOUNTS:
-            return "Account not recognized. Email process cancelled."
-        
-        selected_account = EMAIL_ACCOUNTS[sender_keyword.lower()]
-        EMAIL_ADDRESS, EMAIL_PASSWORD = selected_account["address"], selected_account["password"]
-        
-        # --- Get Recipient ---
-        speak("Who is the recipient?")
-        recipient_query = listen()
-        recipient_email = CONTACTS.get(recipient_query.lower()) if recipient_query else None
-        if not recipient_email:
-            return "Recipient not found in contacts. Email process cancelled."
-        
-        # --- Get Subject ---
-        subject = None
-        while not subject:
-            speak("What is the subject?")
-            subject = listen()
-            if not subject:
-                speak("I didn't catch that. Please repeat the subject.")
-
-        # --- Get Body ---
-        body = None
-        while not body:
-            speak("What is the message?")
-            body = listen()
-            if not body:
-                speak("I didn't catch that. Please repeat the message.")
-        
-        # --- Confirmation ---
-        speak(f"Please confirm. You are sending an email to {recipient_query} with the subject '{subject}'. Is this correct? Say yes or no.")
-        
-        confirmation_attempts = 3
-        while confirmation_attempts > 0:
-            confirmation = listen()
-            if confirmation and 'yes' in confirmation:
-                # --- Send Email ---
-                msg = EmailMessage()
-                msg['Subject'] = subject
-                msg['From'] = EMAIL_ADDRESS
-                msg['To'] = recipient_email
-                msg.set_content(body)
-                
-                with smtplib.SMTP_SSL('smtp.gmail.com', 465) as smtp:
-                    smtp.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-                    smtp.send_message(msg)
-                
-                return "Email sent successfully."
-            elif confirmation and 'no' in confirmation:
-                return "Okay, email cancelled."
-            else:
-                confirmation_attempts -= 1
-                if confirmation_attempts > 0:
-                    speak("I didn't understand. Please say yes or no.")
-        
-        return "Confirmation failed after multiple attempts. Email cancelled."
-
+        msg = EmailMessage()
+        msg['Subject'] = subject
+        msg['From'] = account["address"]
+        msg['To'] = recipient_email
+        msg.set_content(body)
+
+        smtp_class = smtplib.SMTP_SSL if SMTP_USE_SSL else smtplib.SMTP
+        with smtp_class(SMTP_HOST, SMTP_PORT, timeout=REQUEST_TIMEOUT) as smtp:
+            smtp.login(account["address"], account["password"])
+            smtp.send_message(msg)
+
+        return "Email sent successfully."
     except Exception as e:
         print(f"Email Error: {e}")
         return "An error occurred during the email process. Email not sent."
-
@@ -8,6 +8,8 @@
 # 3. Save the file after filling in your details.
 # ==============================================================================
 
+import os
+
 # --- API Keys ---
 # Get your keys from:
 # News API: https://newsapi.org/
@@ -22,6 +24,20 @@ SPOTIPY_CLIENT_ID = 'YOUR_SPOTIFY_CLIENT_ID'
 SPOTIPY_CLIENT_SECRET = 'YOUR_SPOTIFY_CLIENT_SECRET'
 SPOTIPY_REDIRECT_URI = 'http://127.0.0.1:8888/callback/'
 
+# --- Service Endpoints ---
+# You normally don't need to change these. Each one can be overridden with an
+# environment variable, which is how the local service simulator (simulator.py)
+# points the assistant at its stand-in services.
+WEATHER_API_URL = os.environ.get("ASSISTANT_WEATHER_API_URL", "http://api.openweathermap.org/data/2.5/weather")
+NEWS_API_URL = os.environ.get("ASSISTANT_NEWS_API_URL", "https://newsapi.org/v2/top-headlines")
+WIKIPEDIA_API_URL = os.environ.get("ASSISTANT_WIKIPEDIA_API_URL", "http://en.wikipedia.org/w/api.php")
+SPOTIFY_API_URL = os.environ.get("ASSISTANT_SPOTIFY_API_URL", "https://api.spotify.com/v1/")
+# If set, this Spotify access token is used instead of the OAuth login flow
+SPOTIFY_ACCESS_TOKEN = os.environ.get("ASSISTANT_SPOTIFY_ACCESS_TOKEN")
+SMTP_HOST = os.environ.get("ASSISTANT_SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.environ.get("ASSISTANT_SMTP_PORT", "465"))
+SMTP_USE_SSL = os.environ.get("ASSISTANT_SMTP_USE_SSL", "1") == "1"
+
 # --- Application Paths (Examples for Windows) ---
 # Update these paths to match the locations on your computer.
 # Use double backslashes (\\) for Windows paths.
@@ -63,3 +79,130 @@ CONTACTS = {
     "team lead": "lead_email@example.com",
     "friend": "friend_email@example.com"
 }
+
+# --- Screenshot Settings ---
+# Format can be "png", "jpeg" or "webp". JPEG and WebP are much faster to
+# encode than PNG and produce smaller files.
+SCREENSHOT_FORMAT = "png"
+SCREENSHOT_COMPRESS_LEVEL = 1  # PNG zlib level (0-9). 1 is fast with decent compression.
+SCREENSHOT_QUALITY = 85        # JPEG/WebP quality (1-100)
+SCREENSHOT_WORKERS = 2         # Number of background encoder threads
+SCREENSHOT_BURST_MAX = 100     # Upper limit on the number of screenshots in one burst
+
+# --- Dialog Settings ---
+# Multi-turn commands (email, shutdown confirmation) are cancelled if a question
+# goes unanswered for this many seconds, or after this many unclear answers.
+DIALOG_STEP_TIMEOUT = 30
+DIALOG_MAX_RETRIES = 3
+
+# --- Barge-in Settings ---
+# Long responses can be interrupted by talking over them. Speech must be
+# BARGE_IN_RATIO times louder than the background for BARGE_IN_TRIGGER_FRAMES
+# frames. While the assistant is talking, the background includes its own voice
+# picked up by the microphone: its level is learned from the first
+# BARGE_IN_ECHO_FRAMES frames of playback, during which no barge-in is detected.
+BARGE_IN_ENABLED = True
+BARGE_IN_MIN_CHARS = 80        # Only monitor responses at least this long
+BARGE_IN_RATIO = 3.0
+BARGE_IN_MIN_ENERGY = 300      # Absolute RMS energy speech must exceed
+BARGE_IN_TRIGGER_FRAMES = 3
+BARGE_IN_ECHO_FRAMES = 8       # About half a second at the microphone's 1024-sample chunks
+BARGE_IN_END_SILENCE = 0.8     # Seconds of silence that end the interrupting phrase
+BARGE_IN_PHRASE_LIMIT = 10     # Maximum length of the interrupting phrase, in seconds
+
+# --- Intent Classifier ---
+# When no keyword matches, the query is classified against example phrases
+# (see intent.py). Matches scoring below this similarity (0-1) are ignored.
+INTENT_MIN_SCORE = 0.32
+
+# --- Speech Recognition ---
+# Backend used to transcribe speech: "google" (online, the default), or the
+# offline "sphinx" and "whisper" backends if their packages are installed.
+RECOGNIZER_BACKEND = "google"
+RECOGNIZER_LANGUAGE = "en-in"
+# Pick the most sensible of the recognizer's alternative transcripts rather than
+# always the first (Google backend only, see rescore.py). Alternatives are
+# corrected against the app, website and contact names above and these cities.
+NBEST_RESCORING = True
+RESCORE_FUZZY_MIN = 0.8   # How closely (0-1) misheard words must match a known name
+KNOWN_CITIES = ["delhi", "mumbai", "bhopal", "pune", "chennai", "bangalore", "kolkata", "london"]
+
+# --- Audio Preprocessing ---
+# Captured audio is cleaned up before recognition (see preprocess.py): it is
+# converted to 16 kHz mono, filtered, denoised, levelled and trimmed.
+PREPROCESS_AUDIO = True
+PREPROCESS_SAMPLE_RATE = 16000
+PREPROCESS_HIGHPASS_HZ = 80       # Removes rumble below this frequency
+PREPROCESS_NOISE_REDUCTION = 1.5  # How strongly background noise is subtracted
+PREPROCESS_TARGET_DBFS = -20      # Speech level after gain control
+PREPROCESS_TRIM_PADDING = 0.2     # Seconds of silence kept around the speech
+
+# --- Listening and Caching ---
+# Ambient-noise calibration takes a second, so it is reused for this long
+# before the microphone is recalibrated.
+LISTEN_RECALIBRATE_SECONDS = 300
+# Weather and news responses are reused for this many seconds.
+RESPONSE_CACHE_SECONDS = 600
+
+# --- Idle Listening ---
+# After IDLE_AFTER_SECONDS without a command, the assistant stops running full
+# listen() cycles and only checks the microphone level every IDLE_FRAME_SECONDS,
+# which uses far less CPU. It switches back as soon as someone starts talking.
+IDLE_ENABLED = True
+IDLE_AFTER_SECONDS = 120
+IDLE_FRAME_SECONDS = 0.25
+IDLE_SAMPLE_RATE = 16000       # A low capture rate is enough to detect speech
+IDLE_WAKE_RATIO = 2.0          # How many times louder than the background speech must be
+
+# --- History Search ---
+# Questions like "what did I ask yesterday about weather" are answered from an
+# index of the assistant log (see history.py), kept in this SQLite database.
+HISTORY_INDEX_FILE = "history_index.db"
+HISTORY_MAX_RESULTS = 3      # How many past queries are read out
+
+# --- Startup Warm-up ---
+# At startup, the assistant log is analyzed in the background to pre-warm the
+# clients and caches you are most likely to need (see warmup.py).
+WARMUP_ENABLED = True
+WARMUP_TIME_BUDGET = 5           # Seconds. Warm-up stops starting new work after this.
+WARMUP_LOG_TAIL_BYTES = 2000000  # Only the newest part of the log is analyzed
+WARMUP_PROFILE_FILE = "usage_profile.json"
+
+# --- Song Cache ---
+# Songs you have played are remembered so they start without a Spotify search.
+SONG_CACHE_FILE = "song_cache.json"
+SONG_CACHE_SIZE = 500            # Maximum number of remembered songs
+# Set to True to also index your saved and top tracks ahead of time. This needs
+# extra Spotify permissions, so you will be asked to authorize the app again.
+SPOTIFY_PREFETCH_LIBRARY = False
+SONG_INDEX_MAX_AGE = 86400       # Seconds before the library index is refreshed
+
+# --- Compound Commands ---
+# Queries like "weather in Delhi and Mumbai and the news" are split up, and the
+# weather, news and Wikipedia parts run at the same time, each on its own thread.
+# Once this many timed-out parts are still running, new queries run in order.
+COMPOUND_WORKERS = 4
+COMPOUND_TASK_TIMEOUT = 8        # Seconds to wait for each part, from when it starts
+
+# --- Command Time Limits ---
+# Every command has a time budget in seconds (see executor.py). If it runs
+# longer, the assistant stops waiting and says so instead of freezing.
+COMMAND_DEFAULT_TIMEOUT = 10
+COMMAND_TIMEOUTS = {
+    "get_weather": 6,
+    "get_news": 8,
+    "search_wikipedia": 8,
+    "play_song": 8,
+    "pause_music": 5,
+    "next_track": 5,
+    "set_volume": 3,
+    "set_brightness": 3,
+    "take_screenshot": 5,
+    "send_email": 15,
+}
+COMMAND_THREAD_WORKERS = 8       # Threads for network and other commands
+# Volume and brightness run in pre-started worker processes, so a hang or crash
+# in the native APIs they use only takes down the worker.
+COMMAND_PROCESS_WORKERS = 1
+# Seconds before a single network request (weather, news, Spotify, email) gives up
+REQUEST_TIMEOUT = 5
@@ -0,0 +1,304 @@
+# ==============================================================================
+# dialog.py
+# ------------------------------------------------------------------------------
+# This module manages multi-turn conversations such as sending an email or
+# confirming a shutdown. Instead of taking over the main loop with nested
+# speak/listen calls, each conversation is a resumable dialog that the main
+# loop feeds one utterance at a time. Dialogs fill named slots (so a single
+# utterance can answer several questions at once), time out if a step goes
+# unanswered, and can be cancelled at any point by answering just "cancel".
+# ==============================================================================
+
+import re
+import time
+
+import commands as cmd
+import executor
+from config import EMAIL_ACCOUNTS, CONTACTS, DIALOG_STEP_TIMEOUT, DIALOG_MAX_RETRIES
+
+# Words that cancel the active dialog at any step
+CANCEL_WORDS = ("cancel", "stop", "never mind", "nevermind", "abort")
+
+# The whole answer has to be a cancel word, optionally with what is being
+# cancelled and a few fillers ("please cancel", "stop it", "cancel the email"),
+# so a dictated subject or message such as "please stop by my office" doesn't
+# end the dialog
+_CANCEL_ANSWER = re.compile(
+    rf"(?:(?:oh|no|please|just) )*(?:{'|'.join(map(re.escape, CANCEL_WORDS))})"
+    r"(?: (?:the|this|that|my) \w+| (?:email|message|shutdown|restart|sleep))?"
+    r"(?: (?:it|that|this|please|everything|now))*"
+)
+
+_AFFIRMATIVES = {"yes", "yeah", "yep", "sure", "confirm", "correct", "ok", "okay"}
+# Words that negate a yes-word after them, along with anything ending in "n't"
+_NEGATIVES = {"no", "not", "nope", "nah", "never"}
+
+# Words that can follow a negative without changing it ("no thanks", "don't do it")
+_NEGATIVE_FILLERS = {"no", "thanks", "thank", "you", "please", "don't", "do", "it", "that", "way", "not", "send"}
+
+def _contains_word(text, phrase):
+    """Returns True if `phrase` appears in `text` as whole words."""
+    return re.search(rf'\b{re.escape(phrase)}\b', text) is not None
+
+def _find_key(text, mapping):
+    """Returns the longest key of `mapping` that appears in `text` as whole words."""
+    matches = [key for key in mapping if _contains_word(text, key.lower())]
+    return max(matches, key=len) if matches else None
+
+def is_cancel(text):
+    """Returns True if the whole answer asks to cancel the dialog."""
+    return _CANCEL_ANSWER.fullmatch(text.strip(" .!")) is not None
+
+def parse_yes_no(text):
+    """
+    Interprets a confirmation answer.
+
+    A negative before the first yes-word makes the answer a no ("I'm not sure",
+    "no, that is not correct"). A yes only counts when nothing in the answer
+    negates it, and a negative without a yes-word only counts when it stands
+    on its own ("no", "nope, thanks", "don't do it"), so "I don't know" is
+    neither and the question is asked again.
+
+    Returns:
+        bool or None: True for yes, False for no, None if it is neither.
+    """
+    words = re.findall(r"[a-z']+", text)
+    negated = [word in _NEGATIVES or word.endswith("n't") for word in words]
+    first_yes = next((i for i, word in enumerate(words) if word in _AFFIRMATIVES), None)
+    if first_yes is not None:
+        if any(negated[:first_yes]):
+            return False
+        # "yes, no, wait" is unclear, so ask again
+        return None if any(negated) else True
+    if words and words[0] in ("no", "nope", "nah", "don't", "never") and set(words[1:]) <= _NEGATIVE_FILLERS:
+        return False
+    return None
+
+class Dialog:
+    """
+    A multi-turn conversation that fills a list of slots and then completes.
+
+    Subclasses list their slots in order, and implement prompt(), extract()
+    and complete(). The DialogManager asks for the first unfilled slot on
+    each turn until all of them are filled.
+    """
+    slots = ()
+
+    def __init__(self):
+        self.values = {}
+
+    def next_slot(self):
+        """Returns the name of the first unfilled slot, or None if all are filled."""
+        return next((slot for slot in self.slots if slot not in self.values), None)
+
+    def prompt(self, slot):
+        """Returns the question to ask for the given slot."""
+        raise NotImplementedError
+
+    def extract(self, query, expected):
+        """
+        Pulls as many slot values as possible out of one utterance.
+
+        Args:
+            query (str): The user's utterance in lowercase.
+            expected (str or None): The slot the user was just asked for.
+
+        Returns:
+            dict: The slot values found in the utterance.
+        """
+        raise NotImplementedError
+
+    def complete(self):
+        """
+        Performs the action once every slot is filled.
+
+        Returns:
+            str or tuple[str, str]: The response, or the response and the
+            status to log if it isn't "Command Handled".
+        """
+        raise NotImplementedError
+
+    def cancelled(self):
+        """Returns the response spoken when the dialog is cancelled."""
+        return "Okay, cancelled."
+
+class ConfirmDialog(Dialog):
+    """A single yes/no question that runs an action when the user says yes."""
+    slots = ("confirm",)
+
+    def __init__(self, question, action, cancel_message):
+        """
+        Args:
+            question (str): The yes/no question to ask.
+            action (callable): Called with no arguments on "yes". Returns the response.
+            cancel_message (str): The response when the user says "no" or cancels.
+        """
+        super().__init__()
+        self.question = question
+        self.action = action
+        self.cancel_message = cancel_message
+
+    def prompt(self, slot):
+        return f"{self.question} Please say yes or no."
+
+    def extract(self, query, expected):
+        # Never treat the opening utterance itself as the answer
+        if expected != "confirm":
+            return {}
+        answer = parse_yes_no(query)
+        return {} if answer is None else {"confirm": answer}
+
+    def complete(self):
+        return self.action() if self.values["confirm"] else self.cancel_message
+
+    def cancelled(self):
+        return self.cancel_message
+
+class EmailDialog(Dialog):
+    """Collects the account, recipient, subject and message, then sends the email."""
+    slots = ("account", "recipient", "subject", "body", "confirm")
+
+    # Keyword forms that let one utterance fill several slots, e.g.
+    # "to team lead subject lunch message see you at noon"
+    _SUBJECT_PATTERN = re.compile(r'\bsubject (?:is )?(.+?)(?= \b(?:message|body|saying)\b|$)')
+    _BODY_PATTERN = re.compile(r'\b(?:message|body|saying) (?:is )?(.+)$')
+
+    def prompt(self, slot):
+        if slot == "account":
+            return "Which account would you like to send from?"
+        if slot == "recipient":
+            return "Who is the recipient?"
+        if slot == "subject":
+            return "What is the subject?"
+        if slot == "body":
+            return "What is the message?"
+        return (f"Please confirm. You are sending an email to {self.values['recipient']} "
+                f"with the subject '{self.values['subject']}'. Is this correct? Say yes or no.")
+
+    def extract(self, query, expected):
+        found = {}
+        # Confirmation is only accepted once it is the question being asked
+        if expected == "confirm":
+            answer = parse_yes_no(query)
+            return {} if answer is None else {"confirm": answer}
+
+        account = _find_key(query, EMAIL_ACCOUNTS)
+        if account:
+            found["account"] = account
+        recipient = _find_key(query, CONTACTS)
+        if recipient:
+            found["recipient"] = recipient
+        subject = self._SUBJECT_PATTERN.search(query)
+        if subject:
+            found["subject"] = subject.group(1).strip()
+        body = self._BODY_PATTERN.search(query)
+        if body:
+            found["body"] = body.group(1).strip()
+
+        # A free-text answer to a direct question fills that slot as-is, even if
+        # it happens to mention an account or contact name
+        if expected in ("subject", "body") and expected not in found:
+            return {expected: query.strip()}
+        return found
+
+    def complete(self):
+        if not self.values["confirm"]:
+            return "Okay, email cancelled."
+        account = EMAIL_ACCOUNTS[self.values["account"]]
+        # Sending runs under the send_email time budget so a stuck SMTP server can't hang the loop
+        response, failed_status = executor.call(
+            "send_email", cmd.send_email,
+            account, CONTACTS[self.values["recipient"]], self.values["subject"], self.values["body"]
+        )
+        # A send that timed out or crashed is logged as such, not as handled
+        return response, failed_status or "Command Handled"
+
+    def cancelled(self):
+        return "Okay, email cancelled."
+
+class DialogManager:
+    """
+    Drives at most one active dialog, one utterance at a time.
+
+    The main loop hands every utterance to handle() while a dialog is active,
+    and calls check_timeout() on every iteration so an unanswered step ends
+    the dialog instead of blocking the assistant.
+    """
+
+    def __init__(self, step_timeout=DIALOG_STEP_TIMEOUT, max_retries=DIALOG_MAX_RETRIES):
+        self.step_timeout = step_timeout
+        self.max_retries = max_retries
+        self.active = None
+        self._deadline = None
+        self._retries = 0
+
+    def _ask_next(self):
+        """Returns the next prompt, or completes the dialog if every slot is filled."""
+        slot = self.active.next_slot()
+        if slot is None:
+            dialog, self.active = self.active, None
+            try:
+                result = dialog.complete()
+            except Exception as e:
+                print(f"Dialog Error: {e}")
+                return "Sorry, something went wrong. Nothing was done.", "ERROR"
+            return result if isinstance(result, tuple) else (result, "Command Handled")
+        self._deadline = time.monotonic() + self.step_timeout
+        return self.active.prompt(slot), "Dialog Prompt"
+
+    def start(self, dialog, query=""):
+        """
+        Starts a new dialog, filling any slots the opening utterance already answers.
+
+        Args:
+            dialog (Dialog): The dialog to start.
+            query (str): The utterance that triggered the dialog.
+
+        Returns:
+            tuple[str, str]: The response to speak and the status to log.
+        """
+        self.active = dialog
+        self._retries = 0
+        dialog.values.update(dialog.extract(query.lower(), None))
+        return self._ask_next()
+
+    def handle(self, query):
+        """
+        Feeds one utterance to the active dialog.
+
+        Returns:
+            tuple[str, str]: The response to speak and the status to log.
+        """
+        query = query.lower()
+        timed_out = self.check_timeout()
+        if timed_out:
+            return timed_out
+
+        if is_cancel(query):
+            dialog, self.active = self.active, None
+            return dialog.cancelled(), "Dialog Cancelled"
+
+        expected = self.active.next_slot()
+        found = self.active.extract(query, expected)
+        if not found:
+            self._retries += 1
+            if self._retries >= self.max_retries:
+                dialog, self.active = self.active, None
+                return f"I still didn't understand. {dialog.cancelled()}", "Dialog Cancelled"
+            return f"I didn't understand. {self.active.prompt(expected)}", "Dialog Prompt"
+
+        self._retries = 0
+        self.active.values.update(found)
+        return self._ask_next()
+
+    def check_timeout(self):
+        """
+        Ends the active dialog if its current step has gone unanswered for too long.
+
+        Returns:
+            tuple[str, str] or None: The timeout response and status, or None.
+        """
+        if self.active is None or time.monotonic() < self._deadline:
+            return None
+        dialog, self.active = self.active, None
+        return f"I didn't hear an answer in time. {dialog.cancelled()}", "Dialog Timed Out"
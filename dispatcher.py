@@ -0,0 +1,461 @@
+# ==============================================================================
+# dispatcher.py
+# ------------------------------------------------------------------------------
+# This module maps a transcribed query to the command that should handle it.
+# Keyword matching is the fast path. When no keyword matches, a lightweight
+# intent classifier (see intent.py) is tried as a fallback, so paraphrased
+# commands like "remind me to buy milk" still reach the right function.
+# Compound queries ("weather in delhi and the news") are split into their
+# commands, and the network-bound ones run concurrently.
+#
+# Routing is separate from execution: resolve() returns a Route describing the
+# command, and dispatch() runs it. This lets callers inspect or schedule a
+# command before running it.
+# ==============================================================================
+
+import re
+import time
+import functools
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import commands as cmd
+import intent
+import executor
+import history
+import screenshot
+from dialog import ConfirmDialog, EmailDialog
+from config import (
+    INTENT_MIN_SCORE, COMPOUND_WORKERS, COMPOUND_TASK_TIMEOUT, APP_PATHS, WEBSITE_URLS
+)
+
+# A resolved command.
+#   name:   The name of the command (usually the commands.py function name).
+#   call:   A zero-argument callable that performs the command. It returns the
+#           response string, or a (response, status) tuple for dialogs.
+#   status: The status to log if the command runs normally.
+Route = collections.namedtuple("Route", ["name", "call", "status"])
+
+# The route used when a query cannot be matched to any command
+NOT_UNDERSTOOD = "unknown"
+# The route used for a query made up of several commands
+COMPOUND = "compound"
+
+# Commands that only fetch data over the network. These are independent of
+# each other, so the parts of a compound query that use them run concurrently.
+PARALLEL_COMMANDS = {"get_weather", "get_news", "search_wikipedia"}
+
+# Routes that must never be part of a compound query
+_NOT_COMPOUNDABLE = {
+    "restart_computer", "sleep_computer", "shutdown_computer", "send_email", "goodbye", "search_history",
+}
+
+# Splits a compound query at "and", "then" and commas
+_COMPOUND_SEPARATOR = re.compile(r'\s*(?:,|\band then\b|\band\b|\bthen\b)\s*')
+
+# Commands whose free-text argument runs to the end of the query, so a compound
+# query is never split inside it ("search for date and time")
+_FREE_TEXT_COMMANDS = {"search_web", "search_wikipedia", "play_song"}
+# Open commands take the rest of the query too, unless they name a known app or site
+_OPEN_COMMANDS = {"open_app": APP_PATHS, "open_website": WEBSITE_URLS}
+
+# Parts of earlier compound queries still running after their timeout. Each
+# query gets its own threads, so a hung part can't hold up the next query, but
+# once COMPOUND_WORKERS parts are stuck, new queries run their parts in order
+# instead of starting even more threads.
+_abandoned = set()
+_abandoned_lock = threading.Lock()
+
+def as_text(response):
+    """
+    Joins a streamed response (see speak.py) into a single string.
+
+    Commands may return a string or an iterable of sentences. Strings and
+    None are returned unchanged.
+    """
+    if response is None or isinstance(response, str):
+        return response
+    return " ".join(chunk for chunk in response if chunk)
+
+def _run_text(route):
+    """Runs a route and joins its response. Used on the compound thread pool."""
+    response, status = run(route)
+    return as_text(response), status
+
+def _reply(message):
+    """Returns a callable that just returns a fixed message."""
+    return lambda: message
+
+def _command(func, *args, status="Command Handled"):
+    """Builds a Route that calls a function from commands.py with the given arguments."""
+    return Route(func.__name__, functools.partial(func, *args), status)
+
+def _missing(name, message, status="Missing Information"):
+    """Builds a Route for a recognized command that is missing a parameter."""
+    return Route(name, _reply(message), status)
+
+def _extract_city(query_lower):
+    """Pulls the city name out of a weather query such as "weather in the Bhopal"."""
+    city = query_lower.split(' in ')[-1].strip() if ' in ' in query_lower else ""
+    # Remove "the " if it's at the beginning (e.g., "the Bhopal")
+    if city.startswith("the "):
+        city = city.replace("the ", "", 1)
+    return city
+
+def _match_keywords(query_lower, dialogs):
+    """
+    Matches a query against the command keywords.
+
+    This uses a series of if/elif statements to match keywords in the user's
+    query and route them to the correct function in commands.py.
+
+    Returns:
+        Route or None: The matched route, or None if no keyword matched.
+    """
+    # Questions about past queries mention other commands ("when did I last
+    # send an email"), so they are checked before any command keyword
+    if history.HISTORY_QUESTION.search(query_lower):
+        return _command(cmd.search_history, query_lower)
+
+    elif 'hello' in query_lower or 'hey' in query_lower:
+        return _command(cmd.get_greeting)
+
+    elif 'weather in' in query_lower:
+        # Extract the city name from the query
+        city = _extract_city(query_lower)
+        if city:
+            return _command(cmd.get_weather, city)
+        return _missing("get_weather", "You need to specify a city for the weather.")
+
+    elif 'news' in query_lower:
+        return _command(cmd.get_news)
+
+    elif 'wikipedia' in query_lower:
+        # Extract the search term by removing the keyword "wikipedia"
+        search_term = query_lower.replace("wikipedia", "").strip()
+        return _command(cmd.search_wikipedia, search_term)
+
+    elif 'search for' in query_lower:
+        # Extract the search term by splitting the string at "for"
+        search_term = query_lower.split("for")[-1].strip()
+        return _command(cmd.search_web, search_term)
+
+    elif 'add' in query_lower and ('task' in query_lower or 'list' in query_lower):
+        # Use regex to find the task description
+        task = re.search(r'add(.*?)(to my list|to my tasks|task)', query_lower)
+        if task:
+            return _command(cmd.add_todo, task.group(1).strip())
+        return _missing("add_todo", "I didn't hear a task to add.")
+
+    elif "show" in query_lower and ('list' in query_lower or 'tasks' in query_lower):
+        return _command(cmd.show_todos)
+
+    elif 'complete task' in query_lower:
+        # Use regex to find the task number
+        match = re.search(r'task (\d+)', query_lower)
+        if match:
+            return _command(cmd.complete_todo, match.group(1))
+        return _missing("complete_todo", "Please specify which task number to complete.")
+
+    elif 'timer for' in query_lower:
+        # Extract the duration string
+        duration_str = query_lower.replace("timer for", "").strip()
+        return _command(cmd.set_timer, duration_str)
+
+    elif 'calculate' in query_lower:
+        # Extract the calculation part of the query
+        calc_query = query_lower.replace("calculate", "").strip()
+        return _command(cmd.calculate, calc_query)
+
+    elif 'time' in query_lower:
+        return _command(cmd.tell_time)
+
+    elif 'date' in query_lower:
+        return _command(cmd.tell_date)
+
+    elif 'joke' in query_lower:
+        return _command(cmd.tell_joke)
+
+    elif 'open website' in query_lower:
+        website_name = query_lower.replace("open website", "").strip()
+        return _command(cmd.open_website, website_name)
+
+    # A more general 'open' command for applications
+    elif 'open app' in query_lower or ('open' in query_lower and 'website' not in query_lower):
+        app_name = query_lower.replace("open", "").strip()
+        return _command(cmd.open_app, app_name)
+
+    elif 'volume' in query_lower:
+        match = re.search(r'(\d+)', query_lower)
+        if match and 0 <= int(match.group(1)) <= 100:
+            return _command(cmd.set_volume, int(match.group(1)))
+        return _missing("set_volume", "Please specify a volume level between 0 and 100.", "Invalid Parameter")
+
+    elif 'brightness' in query_lower:
+        match = re.search(r'(\d+)', query_lower)
+        if match and 0 <= int(match.group(1)) <= 100:
+            return _command(cmd.set_brightness, int(match.group(1)))
+        return _missing("set_brightness", "Please specify a brightness level between 0 and 100.", "Invalid Parameter")
+
+    elif 'screenshot' in query_lower:
+        # Pick up an optional image format, e.g. "take a jpeg screenshot" or
+        # "take a screenshot as jpg", under any of the names screenshot.py knows
+        fmt = re.search(rf"\b({'|'.join(screenshot.FORMATS)})\b", query_lower)
+        fmt = fmt and fmt.group(1)
+        # Burst mode, e.g. "take 5 screenshots every 2 seconds"
+        burst = re.search(r'(\d+) screenshots? every (\d+) seconds?', query_lower)
+        if burst:
+            return _command(cmd.take_screenshot_burst, int(burst.group(1)), int(burst.group(2)), fmt)
+        return _command(cmd.take_screenshot, fmt)
+
+    elif 'restart' in query_lower:
+        return Route("restart_computer", lambda: dialogs.start(ConfirmDialog(
+            "Are you sure you want to restart?", cmd.restart_computer, "Restart cancelled.")), "Dialog Prompt")
+
+    elif 'sleep' in query_lower:
+        return Route("sleep_computer", lambda: dialogs.start(ConfirmDialog(
+            "Are you sure you want to put the computer to sleep?", cmd.sleep_computer,
+            "Sleep command cancelled.")), "Dialog Prompt")
+
+    elif 'shutdown' in query_lower:
+        return Route("shutdown_computer", lambda: dialogs.start(ConfirmDialog(
+            "Are you sure you want to shut down?", cmd.shutdown_computer, "Shutdown cancelled.")), "Dialog Prompt")
+
+    elif 'email' in query_lower:
+        # Email is a multi-turn dialog. Any details already in the query
+        # (e.g. "email team lead") fill their slots straight away.
+        return Route("send_email", lambda: dialogs.start(EmailDialog(), query_lower), "Dialog Prompt")
+
+    elif 'play music' in query_lower:
+        song_name = query_lower.replace("play music", "").strip()
+        return _command(cmd.play_song, song_name)
+
+    elif 'pause music' in query_lower:
+        return _command(cmd.pause_music)
+
+    elif 'next track' in query_lower:
+        return _command(cmd.next_track)
+
+    elif 'goodbye' in query_lower or 'exit' in query_lower:
+        return Route("goodbye", _reply("Goodbye Sir! Have a great day."), "Command Handled")
+
+    return None
+
+# Intents the classifier still recognizes (so their paraphrases aren't taken
+# for a different command), but that are never run without their keyword
+_KEYWORD_ONLY_INTENTS = {"take_screenshot"}
+
+def _match_intent(query_lower):
+    """
+    Routes a query using the intent classifier. Only used when no keyword matched.
+
+    Only commands whose parameters can be pulled out of free-form text are
+    routed this way. Risky commands (power, email) and commands that leave
+    something behind (screenshots) always need their keyword, so a misheard
+    or off-topic question can't trigger them.
+
+    Returns:
+        Route or None: The matched route, or None if no intent scored high enough.
+    """
+    label, score = intent.classify(query_lower)
+    if label is None or score < INTENT_MIN_SCORE or label in _KEYWORD_ONLY_INTENTS:
+        return None
+
+    if label == "get_weather":
+        city = _extract_city(query_lower)
+        if city:
+            return _command(cmd.get_weather, city)
+        return _missing("get_weather", "You need to specify a city for the weather.")
+    if label == "add_todo":
+        # e.g. "remind me to buy milk", "don't let me forget to call mom"
+        task = re.search(r'(?:remind me to|forget to|remember to|need to|note to)\s+(.+)', query_lower)
+        if task:
+            return _command(cmd.add_todo, task.group(1).strip())
+        return _missing("add_todo", "I didn't hear a task to add.")
+    if label == "play_song":
+        song = re.search(r'(?:play|put on|listen to)\s+(?:the song\s+|some\s+)?(.+)', query_lower)
+        if song:
+            return _command(cmd.play_song, song.group(1).strip())
+        return None
+    if label == "calculate":
+        return _command(cmd.calculate, query_lower)
+
+    # Commands without parameters
+    no_args = {
+        "get_news": cmd.get_news, "show_todos": cmd.show_todos, "tell_time": cmd.tell_time,
+        "tell_date": cmd.tell_date, "tell_joke": cmd.tell_joke, "get_greeting": cmd.get_greeting,
+        "pause_music": cmd.pause_music, "next_track": cmd.next_track,
+    }
+    if label in no_args:
+        return _command(no_args[label])
+    return None
+
+def _split_compound(query_lower):
+    """
+    Splits a query such as "weather in delhi and mumbai and the news" into
+    the routes for each of its commands.
+
+    A part with no command keyword of its own continues the weather request
+    before it ("and mumbai"). A search or open command takes the rest of the
+    query as its argument, so "wikipedia taj mahal and the news" is one
+    Wikipedia search. If any other part can't be matched, the query is not
+    treated as compound, so "add milk and eggs to my list" is left alone.
+
+    Returns:
+        list[Route] or None: The routes, or None if the query is not compound.
+        There is only one route when the first part took the rest of the query.
+    """
+    # The start of each part is kept, so a command can take the rest of the query
+    parts = []
+    start = 0
+    for separator in _COMPOUND_SEPARATOR.finditer(query_lower):
+        parts.append((start, query_lower[start:separator.start()]))
+        start = separator.end()
+    parts.append((start, query_lower[start:]))
+    parts = [(start, part) for start, part in parts if part]
+    if len(parts) < 2:
+        return None
+
+    routes = []
+    for start, part in parts:
+        route = _match_keywords(part, None)
+        if route is None and routes and routes[-1].name == "get_weather":
+            route = _match_keywords(f"weather in {part}", None)
+        if route is None or route.name in _NOT_COMPOUNDABLE:
+            return None
+        if _takes_rest(route):
+            # Extend the same command's argument with the rest of the query,
+            # rather than matching the rest again, which could find a keyword
+            # inside the argument ("wikipedia python and the news")
+            rest = query_lower[start + len(part):]
+            routes.append(_command(route.call.func, f"{route.call.args[0]}{rest}".strip()))
+            return routes
+        routes.append(route)
+    return routes
+
+def _takes_rest(route):
+    """Returns True if a route's argument may run on past the next "and"."""
+    args = getattr(route.call, "args", None)
+    if not args:
+        return False
+    if route.name in _FREE_TEXT_COMMANDS:
+        return True
+    return route.name in _OPEN_COMMANDS and args[0] not in _OPEN_COMMANDS[route.name]
+
+def _abandon(future):
+    """Keeps track of a timed-out part until its thread finishes."""
+    if future.cancel():
+        return
+    with _abandoned_lock:
+        _abandoned.add(future)
+    future.add_done_callback(_forget)
+
+def _forget(future):
+    with _abandoned_lock:
+        _abandoned.discard(future)
+
+def _run_compound(routes):
+    """
+    Runs the routes of a compound query and combines their responses.
+
+    Network-bound commands are started together, each on its own thread of a
+    pool made for this query, while the rest run here in order (under their
+    usual time budgets, see executor.py). Each pooled command has
+    COMPOUND_TASK_TIMEOUT seconds from when it starts, however long the
+    commands run here take, so the total wait is about that of the slowest
+    command. A command that runs out of time is abandoned to finish in the
+    background, and is tracked until it does.
+
+    Returns:
+        tuple[str, str]: The combined response (in the original order) and the status.
+    """
+    parallel = [i for i, route in enumerate(routes) if route.name in PARALLEL_COMMANDS]
+    with _abandoned_lock:
+        stuck = len(_abandoned)
+    if parallel and stuck >= COMPOUND_WORKERS:
+        print(f"{stuck} compound parts are still running after timing out; running this one in order.")
+        parallel = []
+
+    pool = ThreadPoolExecutor(max_workers=len(parallel), thread_name_prefix="compound") if parallel else None
+    started = {}
+
+    def timed(i, route):
+        started[i] = time.monotonic()
+        return _run_text(route)
+
+    pending = {i: pool.submit(timed, i, routes[i]) for i in parallel}
+    responses = []
+    statuses = set()
+    try:
+        for i, route in enumerate(routes):
+            try:
+                if i in pending:
+                    # Every pooled part has a thread of its own, so it starts straight away
+                    deadline = started.get(i, time.monotonic()) + COMPOUND_TASK_TIMEOUT
+                    response, status = pending[i].result(timeout=max(0, deadline - time.monotonic()))
+                else:
+                    response, status = _run_text(route)
+            except FutureTimeoutError:
+                _abandon(pending[i])
+                response, status = "Sorry, one of those requests took too long.", "Timed Out"
+            except Exception as e:
+                print(f"Compound command error in {route.name}: {e}")
+                response, status = "Sorry, one of those requests failed.", "ERROR"
+            responses.append(response)
+            statuses.add(status)
+    finally:
+        if pool:
+            # Don't wait for abandoned parts; their threads exit when they finish
+            pool.shutdown(wait=False)
+
+    status = statuses.pop() if len(statuses) == 1 else "Partially Handled"
+    return " ".join(r for r in responses if r), status
+
+def resolve(query_lower, dialogs):
+    """
+    Works out which command should handle a query.
+
+    Args:
+        query_lower (str): The user's query in lowercase.
+        dialogs (DialogManager): Used to start multi-turn commands.
+
+    Returns:
+        Route: The command to run. Unmatched queries get a NOT_UNDERSTOOD route.
+    """
+    routes = _split_compound(query_lower)
+    if routes and len(routes) == 1:
+        return routes[0]
+    if routes:
+        return Route(COMPOUND, functools.partial(_run_compound, routes), "Command Handled")
+
+    route = _match_keywords(query_lower, dialogs) or _match_intent(query_lower)
+    if route is None:
+        # Default response if no keywords are matched
+        route = Route(NOT_UNDERSTOOD, _reply("I am not sure how to respond to that."), "Command Not Understood")
+    return route
+
+def run(route):
+    """
+    Runs a resolved command within its time budget (see executor.py).
+
+    Returns:
+        tuple[str or iterable[str], str]: The response to speak (a string, or a
+        stream of sentences) and the status to log.
+    """
+    result, failed_status = executor.execute(route)
+    if failed_status:
+        return result, failed_status
+    # Dialogs return their own status along with the response
+    if isinstance(result, tuple):
+        return result
+    return result, route.status
+
+def dispatch(query_lower, dialogs):
+    """
+    Resolves and runs a query in one step.
+
+    Returns:
+        tuple[str, str]: The response to speak and the status to log.
+    """
+    return run(resolve(query_lower, dialogs))
@@ -0,0 +1,327 @@
+# ==============================================================================
+# executor.py
+# ------------------------------------------------------------------------------
+# This module runs commands with a hard time budget, so that a hung network
+# call or a wedged system API can't freeze the assistant.
+#
+#   - Most commands run on a pool of worker threads. If one runs past its
+#     budget, the assistant stops waiting for it and says so. A Python thread
+#     can't be stopped, so the call keeps running in the background: it is
+#     counted as abandoned, and once half the pool's threads are held by
+#     abandoned calls, new calls go to a fresh pool so they can't be starved.
+#   - Commands that call crash-prone native code (the COM volume API, the
+#     brightness API) run in a separate, pre-started worker process. If one
+#     hangs, the process is killed and replaced; if it crashes, only the
+#     worker process dies.
+#   - Streamed responses (see speak.py) are produced on a worker thread too,
+#     and the stream is cut off if the budget runs out before it finishes.
+#
+# Every run is counted, so metrics() reports how often each command times out.
+# ==============================================================================
+
+import time
+import queue
+import logging
+import threading
+import functools
+import collections
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from config import (
+    COMMAND_DEFAULT_TIMEOUT, COMMAND_TIMEOUTS, COMMAND_THREAD_WORKERS, COMMAND_PROCESS_WORKERS
+)
+
+# Commands that run in a worker process rather than a thread
+PROCESS_COMMANDS = {"set_volume", "set_brightness"}
+
+# Commands that only change the assistant's own state (dialogs, fixed replies)
+# and therefore run directly on the calling thread
+INLINE_COMMANDS = {
+    "restart_computer", "sleep_computer", "shutdown_computer", "send_email",
+    "goodbye", "unknown", "compound",
+}
+
+_thread_pool = ThreadPoolExecutor(max_workers=COMMAND_THREAD_WORKERS, thread_name_prefix="command")
+_pool_lock = threading.Lock()
+# Timed-out calls that are still running, mapped to the pool whose thread they hold
+_abandoned = {}
+
+# Per-command counters: calls, ok, timeouts, crashes and total seconds
+_metrics = collections.defaultdict(collections.Counter)
+_metrics_lock = threading.Lock()
+
+def _record(name, outcome, seconds):
+    with _metrics_lock:
+        counters = _metrics[name]
+        counters["calls"] += 1
+        counters[outcome] += 1
+        counters["seconds"] += seconds
+
+def _timeout_message(name):
+    return f"Sorry, {name.replace('_', ' ')} is taking too long, so I stopped waiting for it."
+
+def _crash_message(name):
+    return f"Sorry, {name.replace('_', ' ')} failed unexpectedly."
+
+def budget_for(name):
+    """Returns the time budget for a command, in seconds."""
+    return COMMAND_TIMEOUTS.get(name, COMMAND_DEFAULT_TIMEOUT)
+
+# --- Worker threads ---
+
+def _submit(func, *args):
+    """Submits work to the current thread pool, returning the future and the pool."""
+    with _pool_lock:
+        return _thread_pool.submit(func, *args), _thread_pool
+
+def _abandon(name, future, pool):
+    """
+    Stops waiting for a timed-out call on the thread pool.
+
+    A call that hasn't started yet is cancelled. A running one can't be, so it
+    is tracked until it finishes, and if abandoned calls hold half the pool's
+    threads, the pool is replaced. Its threads exit as their calls finish.
+    """
+    global _thread_pool
+    if future.cancel():
+        return
+    with _metrics_lock:
+        _metrics[name]["abandoned"] += 1
+    with _pool_lock:
+        _abandoned[future] = pool
+        stuck = sum(1 for held in _abandoned.values() if held is pool)
+        if pool is _thread_pool and stuck >= max(1, COMMAND_THREAD_WORKERS // 2):
+            logging.warning(f"{stuck} timed-out commands are still running; starting a new command pool")
+            _thread_pool = ThreadPoolExecutor(max_workers=COMMAND_THREAD_WORKERS, thread_name_prefix="command")
+            pool.shutdown(wait=False)
+    future.add_done_callback(_forget)
+
+def _forget(future):
+    with _pool_lock:
+        _abandoned.pop(future, None)
+
+def still_running():
+    """Returns how many timed-out calls are still running in the background."""
+    with _pool_lock:
+        return len(_abandoned)
+
+# --- Worker processes ---
+
+def _process_main(conn):
+    """The loop run by a worker process: call commands by name until told to stop."""
+    import commands
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        name, args = request
+        try:
+            conn.send(("ok", getattr(commands, name)(*args)))
+        except Exception as e:
+            conn.send(("error", repr(e)))
+
+class _ProcessWorker:
+    """One pre-started worker process and the pipe used to talk to it."""
+
+    def __init__(self):
+        context = multiprocessing.get_context("spawn")
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_process_main, args=(child_conn,), daemon=True)
+        self.process.start()
+
+    def call(self, name, args, timeout):
+        """
+        Runs a command in the worker.
+
+        Returns:
+            tuple[str, object]: ("ok", response), ("error", message),
+            ("timeout", None) or ("crashed", None).
+        """
+        try:
+            self.conn.send((name, args))
+            if not self.conn.poll(timeout):
+                return "timeout", None
+            return self.conn.recv()
+        except (EOFError, OSError):
+            return "crashed", None
+
+    def kill(self):
+        self.process.kill()
+        self.conn.close()
+
+_idle_workers = queue.Queue()
+_workers_started = False
+_workers_lock = threading.Lock()
+
+def start():
+    """Pre-starts the worker processes so the first native command doesn't wait for one."""
+    global _workers_started
+    with _workers_lock:
+        if _workers_started:
+            return
+        _workers_started = True
+    for _ in range(COMMAND_PROCESS_WORKERS):
+        _idle_workers.put(_ProcessWorker())
+
+def _replace_worker(worker):
+    """Kills a hung or crashed worker and starts a fresh one in the background."""
+    worker.kill()
+    threading.Thread(target=lambda: _idle_workers.put(_ProcessWorker()), daemon=True).start()
+
+def _run_in_process(name, args, budget):
+    start()
+    deadline = time.monotonic() + budget
+    try:
+        worker = _idle_workers.get(timeout=budget)
+    except queue.Empty:
+        return "timeout", None
+    outcome, value = worker.call(name, args, max(0, deadline - time.monotonic()))
+    if outcome in ("timeout", "crashed"):
+        _replace_worker(worker)
+    else:
+        _idle_workers.put(worker)
+    return outcome, value
+
+# --- Streamed responses ---
+
+def _pump(chunks, chunk_queue, cancelled):
+    """Pulls a response stream into a queue on a worker thread."""
+    try:
+        for chunk in chunks:
+            if cancelled.is_set():
+                break
+            chunk_queue.put(("chunk", chunk))
+        chunk_queue.put(("done", None))
+    except Exception as e:
+        chunk_queue.put(("error", e))
+    finally:
+        # Runs the generator's cleanup if we stopped early
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+def _bounded_stream(name, chunks, started, budget):
+    """
+    Re-yields a response stream, giving up once the command's budget is spent.
+
+    The stream is produced on a worker thread so a chunk that never arrives
+    can't block the speech layer. If it runs out of time, the producer stops
+    at its next chunk; until then it counts as abandoned.
+    """
+    chunk_queue = queue.Queue()
+    cancelled = threading.Event()
+    future, pool = _submit(_pump, chunks, chunk_queue, cancelled)
+    deadline = started + budget
+    try:
+        while True:
+            try:
+                kind, value = chunk_queue.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                _record(name, "timeouts", time.monotonic() - started)
+                _abandon(name, future, pool)
+                yield _timeout_message(name)
+                return
+            if kind == "chunk":
+                yield value
+            elif kind == "done":
+                _record(name, "ok", time.monotonic() - started)
+                return
+            else:
+                print(f"Command error in {name}: {value}")
+                _record(name, "crashes", time.monotonic() - started)
+                yield _crash_message(name)
+                return
+    finally:
+        cancelled.set()
+
+# --- Public interface ---
+
+def call(name, func, *args):
+    """
+    Runs func(*args) on a worker thread within the budget for `name`.
+
+    Returns:
+        tuple[object, str or None]: The result (or a spoken error message) and
+        None on success, "Timed Out" or "ERROR" otherwise.
+    """
+    budget = budget_for(name)
+    started = time.monotonic()
+    future, pool = _submit(func, *args)
+    try:
+        result = future.result(timeout=budget)
+    except FutureTimeoutError:
+        # A running thread can't be stopped; its result is discarded when it finishes
+        _record(name, "timeouts", time.monotonic() - started)
+        _abandon(name, future, pool)
+        return _timeout_message(name), "Timed Out"
+    except Exception as e:
+        print(f"Command error in {name}: {e}")
+        _record(name, "crashes", time.monotonic() - started)
+        return _crash_message(name), "ERROR"
+
+    # A streamed response keeps producing after we return, so keep it on the clock
+    if result is not None and not isinstance(result, (str, tuple)):
+        return _bounded_stream(name, iter(result), started, budget), None
+    _record(name, "ok", time.monotonic() - started)
+    return result, None
+
+def execute(route):
+    """
+    Runs a dispatcher Route under its time budget.
+
+    Args:
+        route (dispatcher.Route): The resolved command.
+
+    Returns:
+        tuple[object, str or None]: The command's result, and an overriding
+        status ("Timed Out" or "ERROR") if it did not finish normally.
+    """
+    if route.name in INLINE_COMMANDS:
+        return route.call(), None
+
+    # Native commands run in a worker process. Only plain calls to commands.py
+    # functions can be sent there; fixed replies (e.g. missing parameters) can't.
+    if route.name in PROCESS_COMMANDS and isinstance(route.call, functools.partial):
+        started = time.monotonic()
+        outcome, value = _run_in_process(route.call.func.__name__, route.call.args, budget_for(route.name))
+        elapsed = time.monotonic() - started
+        if outcome == "ok":
+            _record(route.name, "ok", elapsed)
+            return value, None
+        if outcome == "timeout":
+            _record(route.name, "timeouts", elapsed)
+            return _timeout_message(route.name), "Timed Out"
+        print(f"Command error in {route.name}: {value or 'worker process crashed'}")
+        _record(route.name, "crashes", elapsed)
+        return _crash_message(route.name), "ERROR"
+
+    return call(route.name, route.call)
+
+def metrics():
+    """
+    Returns the counters for every command that has run.
+
+    Returns:
+        dict[str, dict]: calls, ok, timeouts, crashes, total seconds and the
+        timeout rate for each command name, and how many of its timed-out
+        calls were abandoned while still running on a thread.
+    """
+    with _metrics_lock:
+        report = {}
+        for name, counters in _metrics.items():
+            report[name] = dict(counters)
+            report[name]["timeout_rate"] = round(counters["timeouts"] / counters["calls"], 3)
+        return report
+
+def log_metrics():
+    """Writes the command metrics to the assistant log."""
+    for name, counters in sorted(metrics().items()):
+        logging.info(
+            f"Command metrics: {name} calls={counters['calls']} ok={counters.get('ok', 0)} "
+            f"timeouts={counters.get('timeouts', 0)} crashes={counters.get('crashes', 0)} "
+            f"abandoned={counters.get('abandoned', 0)} timeout_rate={counters['timeout_rate']}"
+        )
+    logging.info(f"Command metrics: {still_running()} timed-out commands still running")
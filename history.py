@@ -0,0 +1,329 @@
+# ==============================================================================
+# history.py
+# ------------------------------------------------------------------------------
+# This module answers questions about what the user has asked before, such as
+# "what did I ask yesterday about weather" or "when did I last send an email".
+#
+# Scanning the whole assistant log for every question would get slow once the
+# log is hundreds of megabytes, so an index is kept next to it in a small
+# SQLite database (HISTORY_INDEX_FILE):
+#   - "queries": the byte offset and date of every query line.
+#   - "postings": for each word used in a query, the byte offsets of the query
+#     lines containing it (an inverted index).
+#   - "progress": how far into the log has been indexed.
+# New log lines are only ever appended to the index, a batch per transaction,
+# so an update costs the same however large the index has grown. Updates run
+# on a background thread: logger.log_command() only wakes it (see notify()),
+# so logging never waits for indexing. A lookup catches up with the log, asks
+# the database for the offsets that match, and reads just those lines from the
+# log through mmap, so only the matching parts of the file are touched.
+# ==============================================================================
+
+import os
+import re
+import mmap
+import sqlite3
+import datetime
+import threading
+
+from logger import LOG_FILE, QUERY_LINE
+from config import HISTORY_INDEX_FILE, HISTORY_MAX_RESULTS
+
+# Questions about the history itself, which are not indexed, so that asking
+# "what did I ask about weather" doesn't show up in its own answer next time
+HISTORY_QUESTION = re.compile(r"\b(?:what did i (?:ask|say)|when did i last|what have i asked|my history)\b")
+
+# Words that say nothing about what was asked
+_STOPWORDS = {
+    "a", "an", "the", "i", "me", "my", "to", "of", "in", "on", "for", "and", "or", "is",
+    "it", "what", "when", "did", "do", "last", "about", "ask", "asked", "say", "said",
+    "yesterday", "today", "week", "this", "please", "you", "can", "was", "with",
+}
+
+# Command verbs are left out of the search when the question has other words,
+# so "when did I last send an email" also finds "email team lead"
+_VERBS = {"send", "open", "play", "set", "check", "get", "show", "tell", "take", "search"}
+
+# Queries written to the index per transaction while catching up with a long log,
+# so the indexed position is saved regularly and a lookup never waits too long
+_BATCH_QUERIES = 5000
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS progress (log_offset INTEGER NOT NULL);
+    CREATE TABLE IF NOT EXISTS queries (offset INTEGER PRIMARY KEY, day TEXT NOT NULL);
+    CREATE INDEX IF NOT EXISTS queries_by_day ON queries (day, offset);
+    CREATE TABLE IF NOT EXISTS postings (
+        term TEXT NOT NULL, offset INTEGER NOT NULL, PRIMARY KEY (term, offset)
+    ) WITHOUT ROWID;
+"""
+
+# Guards the database connection, which is shared by the indexer and lookups.
+# It is only held for one statement or batch at a time, so a lookup can run
+# between the batches of a long catch-up.
+_lock = threading.Lock()
+_db = None
+# Held for a whole update(), so two updates never index the same lines
+_update_lock = threading.Lock()
+
+# Wakes the background indexer when something new has been logged
+_wake = threading.Event()
+_indexer = None
+_indexer_lock = threading.Lock()
+
+def _terms(text):
+    """Returns the distinct meaningful words in a query, with plurals made singular."""
+    terms = set()
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if word in _STOPWORDS or len(word) < 2:
+            continue
+        # A crude plural rule, applied the same way to the log and to questions
+        terms.add(word[:-1] if len(word) > 3 and word.endswith("s") else word)
+    return terms
+
+def _connect():
+    """Opens the index database on first use. Must be called with the lock held."""
+    global _db
+    if _db is None:
+        db = sqlite3.connect(HISTORY_INDEX_FILE, check_same_thread=False)
+        # The write-ahead log makes each small append a cheap sequential write
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        with db:
+            db.executescript(_SCHEMA)
+            if db.execute("SELECT COUNT(*) FROM progress").fetchone()[0] == 0:
+                db.execute("INSERT INTO progress VALUES (0)")
+        _db = db
+    return _db
+
+def _write(db, queries, postings, log_offset):
+    """Appends a batch of indexed queries and records how far the log has been read."""
+    with db:
+        db.executemany("INSERT OR IGNORE INTO queries VALUES (?, ?)", queries)
+        db.executemany("INSERT OR IGNORE INTO postings VALUES (?, ?)", postings)
+        db.execute("UPDATE progress SET log_offset = ?", (log_offset,))
+
+def update(log_file=LOG_FILE, blocking=True):
+    """
+    Indexes any log lines written since the last update.
+
+    Only the new part of the log is read, and it is appended to the index.
+    Normally this runs on the background indexer (see notify()); lookups also
+    call it to pick up anything the indexer hasn't reached yet.
+
+    Args:
+        log_file (str): The assistant log file.
+        blocking (bool): If False and another update is already running,
+            return immediately instead of waiting for it to finish.
+
+    Returns:
+        int: The number of new queries indexed.
+    """
+    if not _update_lock.acquire(blocking=blocking):
+        return 0
+    try:
+        with _lock:
+            db = _connect()
+            try:
+                size = os.path.getsize(log_file)
+            except OSError:
+                return 0
+            log_offset = db.execute("SELECT log_offset FROM progress").fetchone()[0]
+            if log_offset > size:
+                # The log has been truncated or replaced, so start again
+                with db:
+                    db.execute("DELETE FROM queries")
+                    db.execute("DELETE FROM postings")
+                log_offset = 0
+        if log_offset == size:
+            return 0
+
+        added = 0
+        queries, postings = [], []
+        with open(log_file, "rb") as f:
+            f.seek(log_offset)
+            offset = log_offset
+            for line in f:
+                # Leave a line that is still being written for the next update
+                if not line.endswith(b"\n"):
+                    break
+                match = QUERY_LINE.match(line.rstrip(b"\n"))
+                if match:
+                    query = match.group(3).decode("utf-8", errors="replace")
+                    if query != "No input detected" and not HISTORY_QUESTION.search(query.lower()):
+                        queries.append((offset, match.group(1).decode()))
+                        postings.extend((term, offset) for term in _terms(query))
+                offset += len(line)
+                if len(queries) >= _BATCH_QUERIES:
+                    # The lock is released between batches, so a lookup
+                    # waits for one batch at most
+                    with _lock:
+                        _write(_connect(), queries, postings, offset)
+                    added += len(queries)
+                    queries, postings = [], []
+        with _lock:
+            _write(_connect(), queries, postings, offset)
+        return added + len(queries)
+    finally:
+        _update_lock.release()
+
+def _index_forever(log_file):
+    """Runs on the background indexer thread, indexing whenever it is woken."""
+    while True:
+        _wake.wait()
+        _wake.clear()
+        try:
+            update(log_file)
+        except (OSError, sqlite3.Error) as e:
+            print(f"History index error: {e}")
+
+def notify(log_file=LOG_FILE):
+    """
+    Tells the background indexer that something new has been logged.
+
+    Returns immediately. The indexer thread is started on first use, and the
+    first pass catches up with anything logged while the assistant wasn't running.
+    """
+    global _indexer
+    with _indexer_lock:
+        if _indexer is None:
+            _indexer = threading.Thread(target=_index_forever, args=(log_file,), daemon=True)
+            _indexer.start()
+    _wake.set()
+
+def close():
+    """Closes the index database (e.g. when the assistant exits)."""
+    global _db
+    with _lock:
+        if _db is not None:
+            _db.close()
+            _db = None
+
+# --- Lookups ---
+
+def _read_entries(offsets, log_file):
+    """
+    Reads the query lines at the given offsets, and the response after each.
+
+    Returns:
+        list[dict]: The time, query and response of each entry.
+    """
+    entries = []
+    if not offsets:
+        return entries
+    with open(log_file, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for offset in offsets:
+            end = mm.find(b"\n", offset)
+            match = QUERY_LINE.match(mm[offset:end])
+            if not match:
+                continue
+            response_end = mm.find(b"\n", end + 1)
+            response_line = mm[end + 1:response_end if response_end != -1 else len(mm)].decode("utf-8", errors="replace")
+            response = re.search(r"Assistant Response: '(.*)' \| Status", response_line)
+            entries.append({
+                "time": datetime.datetime.strptime(mm[offset:offset + 19].decode(), "%Y-%m-%d %H:%M:%S"),
+                "query": match.group(3).decode("utf-8", errors="replace"),
+                "response": response.group(1) if response else None,
+            })
+    return entries
+
+def _date_range(query_lower, today):
+    """
+    Works out which days a question is about.
+
+    Returns:
+        tuple[tuple[date, date] or None, str]: The first and last day (None
+        for any time) and how to describe them in the answer.
+    """
+    if "yesterday" in query_lower:
+        yesterday = today - datetime.timedelta(days=1)
+        return (yesterday, yesterday), "Yesterday"
+    if "today" in query_lower:
+        return (today, today), "Today"
+    if "last week" in query_lower:
+        start = today - datetime.timedelta(days=today.weekday() + 7)
+        return (start, start + datetime.timedelta(days=6)), "Last week"
+    if "this week" in query_lower:
+        return (today - datetime.timedelta(days=today.weekday()), today), "This week"
+    match = re.search(r"last (\d+) days", query_lower)
+    if match:
+        days = int(match.group(1))
+        try:
+            start = today - datetime.timedelta(days=days - 1)
+        except OverflowError:
+            # "The last million days" goes back further than dates do
+            start = datetime.date.min
+        return (start, today), f"In the last {days} days"
+    return None, ""
+
+def find(terms=(), days=None, limit=None, log_file=LOG_FILE):
+    """
+    Finds past queries containing all the given terms, on the given days.
+
+    Args:
+        terms (iterable[str]): Words that must all appear in the query.
+        days (tuple[date, date]): Only look from the first to the last of
+            these days, inclusive. None means any day.
+        limit (int): Only read this many of the newest matches from the log.
+        log_file (str): The assistant log file.
+
+    Returns:
+        list[dict]: Matching entries (time, query, response), newest first.
+        int: The total number of matches.
+    """
+    # If the indexer is busy catching up, answer from what it has indexed so
+    # far rather than waiting for it
+    update(log_file, blocking=False)
+    # Each condition selects a set of offsets, and the database intersects them
+    selects, params = [], []
+    for term in terms:
+        selects.append("SELECT offset FROM postings WHERE term = ?")
+        params.append(term)
+    if days is not None:
+        # ISO dates sort as text in date order
+        selects.append("SELECT offset FROM queries WHERE day BETWEEN ? AND ?")
+        params.extend(day.isoformat() for day in days)
+    if not selects:
+        selects.append("SELECT offset FROM queries")
+    with _lock:
+        rows = _connect().execute(" INTERSECT ".join(selects) + " ORDER BY offset", params).fetchall()
+    offsets = [row[0] for row in rows]
+    newest = offsets[-limit:] if limit else offsets
+    return list(reversed(_read_entries(newest, log_file))), len(offsets)
+
+def answer(query_lower, now=None, log_file=LOG_FILE):
+    """
+    Answers a spoken question about the history.
+
+    Args:
+        query_lower (str): The question, e.g. "when did i last send an email".
+        now (datetime.datetime): The current time. Defaults to now.
+        log_file (str): The assistant log file.
+
+    Returns:
+        str: The answer to speak.
+    """
+    now = now or datetime.datetime.now()
+    days, when = _date_range(query_lower, now.date())
+    # Everything after the question phrase says what the question is about
+    subject = HISTORY_QUESTION.split(query_lower, maxsplit=1)[-1]
+    subject = re.sub(r"\b(?:last \d+ days|last week|this week)\b", " ", subject)
+    terms = _terms(subject)
+    terms = terms - _VERBS or terms
+
+    latest_only = "when did i last" in query_lower
+    entries, total = find(terms, days, 1 if latest_only else HISTORY_MAX_RESULTS, log_file)
+    # Describe the topic in the user's own words rather than the index terms
+    topic_words = [w for w in re.findall(r"[a-z0-9]+", subject) if w not in _STOPWORDS and len(w) > 1]
+    topic = f" about {' '.join(topic_words)}" if topic_words else ""
+    if not entries:
+        return f"I couldn't find anything you asked{topic}."
+
+    if latest_only:
+        latest = entries[0]
+        return f"You last asked '{latest['query']}' on {latest['time']:%A %d %B at %H:%M}."
+
+    listed = ", ".join(f"'{e['query']}' at {e['time']:%H:%M}" for e in entries)
+    more = f" and {total - len(entries)} more" if total > len(entries) else ""
+    if days is None:
+        return f"You asked{topic}: {listed}{more}."
+    return f"{when} you asked{topic}: {listed}{more}."
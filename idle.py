@@ -0,0 +1,167 @@
+# ==============================================================================
+# idle.py
+# ------------------------------------------------------------------------------
+# This module puts the assistant's listening into a low-power mode when no one
+# has used it for a while.
+#
+# In the normal (active) mode, the main loop runs listen() back to back, which
+# reads small audio buffers many times a second. After IDLE_AFTER_SECONDS
+# without a command, the loop calls IdlePolicy.wait_for_speech() instead. It
+# keeps one low-rate microphone stream open and reads it in long blocks
+# (IDLE_FRAME_SECONDS), only measuring each block's energy. When a block is loud
+# enough to be speech, it immediately switches back to small buffers, records
+# the utterance (keeping the block that woke it, so no words are lost) and
+# returns the transcript, and the loop goes back to the active mode.
+#
+# CPU time and wakeups (audio buffer reads) are counted for each mode, so the
+# saving can be measured; see report().
+# ==============================================================================
+
+import time
+import logging
+import collections
+
+import speech_recognition as sr
+
+import listen
+from bargein import VoiceActivityDetector, record_phrase
+from config import (
+    IDLE_ENABLED, IDLE_AFTER_SECONDS, IDLE_FRAME_SECONDS, IDLE_SAMPLE_RATE, IDLE_WAKE_RATIO
+)
+
+ACTIVE = "active"
+IDLE = "idle"
+
+class IdlePolicy:
+    """
+    Decides when to listen in low-power mode, and measures both modes.
+
+    Usage: call is_idle() before each listen, wait_for_speech() instead of
+    listen() while it returns True, and record(query) after every attempt.
+    """
+
+    def __init__(self, idle_after=IDLE_AFTER_SECONDS, enabled=IDLE_ENABLED):
+        """
+        Args:
+            idle_after (float): Seconds without a command before going idle.
+            enabled (bool): If False, is_idle() always returns False.
+        """
+        self.idle_after = idle_after
+        self.enabled = enabled
+        self.mode = ACTIVE
+        self.last_activity = time.monotonic()
+        # Per mode: wall seconds, CPU seconds and wakeups
+        self.stats = {ACTIVE: collections.Counter(), IDLE: collections.Counter()}
+        self._mode_started = time.monotonic()
+        self._cpu_started = time.process_time()
+        self._reads_started = listen.frame_reads
+        self._idle_reads = 0
+
+    def _switch(self, mode):
+        """Closes the current mode's measurements and starts the new mode."""
+        now, cpu = time.monotonic(), time.process_time()
+        stats = self.stats[self.mode]
+        stats["seconds"] += now - self._mode_started
+        stats["cpu_seconds"] += cpu - self._cpu_started
+        stats["wakeups"] += listen.frame_reads - self._reads_started + self._idle_reads
+        if mode != self.mode:
+            logging.info(f"Listening mode: {self.mode} -> {mode}")
+        self.mode = mode
+        self._mode_started, self._cpu_started = now, cpu
+        self._reads_started = listen.frame_reads
+        self._idle_reads = 0
+
+    def is_idle(self):
+        """Returns True once there has been no command for `idle_after` seconds."""
+        return self.enabled and time.monotonic() - self.last_activity >= self.idle_after
+
+    def record(self, query):
+        """Records the result of a listen: any recognized speech counts as activity."""
+        if query:
+            self.last_activity = time.monotonic()
+
+    def wait_for_speech(self, read=None, sample_rate=IDLE_SAMPLE_RATE, sample_width=2):
+        """
+        Waits in low-power mode until someone speaks, then transcribes them.
+
+        Args:
+            read (callable): Optional function returning the next `n` frames of
+                raw PCM audio (for simulated input). Defaults to the microphone.
+            sample_rate (int): Sample rate of `read`, in Hz.
+            sample_width (int): Bytes per sample of `read`.
+
+        Returns:
+            str or None: The transcribed utterance, or None if it was not understood.
+        """
+        self._switch(IDLE)
+        try:
+            if read is not None:
+                audio = self._monitor(read, sample_rate, sample_width, 1024)
+            else:
+                with sr.Microphone(sample_rate=IDLE_SAMPLE_RATE) as source:
+                    audio = self._monitor(source.stream.read, source.SAMPLE_RATE, source.SAMPLE_WIDTH, source.CHUNK)
+        except Exception as e:
+            print(f"Idle monitor error: {e}")
+            audio = None
+        finally:
+            # Speech (or an error) ends the idle period either way
+            self.last_activity = time.monotonic()
+            self._switch(ACTIVE)
+        return listen.recognize(audio) if audio is not None else None
+
+    def _monitor(self, read, sample_rate, sample_width, chunk):
+        """Reads long blocks until one contains speech, then records the utterance."""
+        block = int(sample_rate * IDLE_FRAME_SECONDS)
+        # A single loud block is enough to wake up. The recognizer's calibrated
+        # threshold is the minimum, so steady background noise never wakes it.
+        vad = VoiceActivityDetector(
+            ratio=IDLE_WAKE_RATIO, min_energy=listen.energy_threshold(), trigger_frames=1
+        )
+        previous = b""
+        while True:
+            frame = read(block)
+            self._idle_reads += 1
+            if not frame:
+                return None
+            if vad.update(frame, sample_width):
+                break
+            previous = frame
+
+        # Ramp up: read normal-sized buffers while recording the rest of the phrase
+        def frames():
+            while True:
+                data = read(chunk)
+                self._idle_reads += 1
+                if not data:
+                    return
+                yield data
+        return record_phrase(frames(), vad, [previous, frame], sample_rate, sample_width)
+
+    def report(self):
+        """
+        Returns CPU use and wakeups for each mode so far.
+
+        Returns:
+            dict[str, dict]: For "active" and "idle": seconds, cpu_seconds,
+            cpu_percent, wakeups and wakeups_per_hour.
+        """
+        self._switch(self.mode)
+        report = {}
+        for mode, stats in self.stats.items():
+            seconds = stats["seconds"]
+            report[mode] = {
+                "seconds": round(seconds, 1),
+                "cpu_seconds": round(stats["cpu_seconds"], 2),
+                "cpu_percent": round(100 * stats["cpu_seconds"] / seconds, 2) if seconds else 0.0,
+                "wakeups": stats["wakeups"],
+                "wakeups_per_hour": round(stats["wakeups"] * 3600 / seconds) if seconds else 0,
+            }
+        return report
+
+    def log_report(self):
+        """Writes the per-mode CPU and wakeup figures to the assistant log."""
+        for mode, figures in self.report().items():
+            logging.info(
+                f"Listening {mode}: {figures['seconds']}s, CPU {figures['cpu_percent']}%, "
+                f"{figures['wakeups_per_hour']} wakeups/hour"
+            )
@@ -0,0 +1,189 @@
+# ==============================================================================
+# intent.py
+# ------------------------------------------------------------------------------
+# This module is a small on-device intent classifier used as a fallback when
+# keyword matching in the dispatcher finds nothing. Each intent has a handful
+# of example phrases. At startup these are turned into TF-IDF weighted
+# character n-gram vectors and averaged into one normalized centroid per
+# intent. A query is classified by cosine similarity to the nearest centroid,
+# which takes only microseconds and needs nothing but NumPy.
+#
+# N-grams that never appear in the examples still count towards the length of
+# the query vector (at the highest IDF weight), so a query that is mostly about
+# something else ("what should i eat for dinner") scores low everywhere instead
+# of being judged only by the few n-grams it shares with the examples.
+# ==============================================================================
+
+import collections
+
+import numpy as np
+
+# Example phrases for each intent. The labels are commands.py function names.
+# These should be paraphrases that the keyword rules in dispatcher.py miss.
+INTENT_EXAMPLES = {
+    "get_weather": [
+        "what's it like outside in pune", "is it raining in mumbai", "how hot is it in delhi",
+        "will i need an umbrella in london", "temperature in chennai", "forecast for bangalore",
+        "is it cold outside in paris", "how's the sky looking in bhopal",
+    ],
+    "get_news": [
+        "what's happening in the world", "any headlines today", "what are the top stories",
+        "catch me up on current events", "latest updates from india", "read me the headlines",
+    ],
+    "add_todo": [
+        "remind me to buy milk", "remind me to call mom", "don't let me forget to pay rent",
+        "i need to finish the report", "remember to water the plants", "note to pick up groceries",
+    ],
+    "show_todos": [
+        "what do i have to do", "what's on my plate today", "read my to do items",
+        "what are my pending jobs", "what's left to do", "what did i plan for today",
+    ],
+    "tell_time": [
+        "what's the clock say", "how late is it", "what hour is it", "do you know the current hour",
+    ],
+    "tell_date": [
+        "what day is it today", "which day of the month is it", "what's today",
+        "what month are we in", "what's the day today",
+    ],
+    "tell_joke": [
+        "make me laugh", "say something funny", "cheer me up", "tell me something hilarious",
+        "i need a laugh",
+    ],
+    "get_greeting": [
+        "good morning", "hi there", "good evening assistant", "howdy", "what's up",
+    ],
+    "take_screenshot": [
+        "capture my screen", "grab the screen", "save a picture of the screen", "snap the display",
+    ],
+    "play_song": [
+        "play blinding lights", "put on some jazz", "i want to listen to shape of you",
+        "play the song believer", "listen to something by coldplay", "put on bohemian rhapsody",
+    ],
+    "pause_music": [
+        "stop the song", "pause the playback", "hold the music", "stop playing", "mute the song",
+    ],
+    "next_track": [
+        "skip this song", "skip this one", "play the next song", "change the song", "skip ahead",
+    ],
+    "calculate": [
+        "what is 5 times 3", "what's 12 plus 30", "how much is 100 divided by 4",
+        "what's 7 minus 2", "multiply 6 by 9", "add 4 and 5 together",
+    ],
+}
+
+def _ngrams(text, low=3, high=5):
+    """
+    Returns the character n-grams of a text, taken within word boundaries.
+
+    Each word is padded with spaces so that n-grams at the start and end of a
+    word are distinct from those in the middle.
+    """
+    grams = []
+    for word in text.lower().split():
+        padded = f" {word} "
+        for n in range(low, high + 1):
+            grams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return grams
+
+class IntentClassifier:
+    """A nearest-centroid classifier over TF-IDF character n-gram vectors."""
+
+    def __init__(self, examples=INTENT_EXAMPLES):
+        """
+        Builds the vocabulary, IDF weights and one centroid per intent.
+
+        Args:
+            examples (dict[str, list[str]]): Example phrases keyed by intent label.
+        """
+        self.labels = list(examples)
+        phrases = [(label, phrase) for label in self.labels for phrase in examples[label]]
+
+        # Vocabulary of every n-gram seen in the examples
+        self.vocab = {}
+        for _, phrase in phrases:
+            for gram in _ngrams(phrase):
+                self.vocab.setdefault(gram, len(self.vocab))
+
+        # Document frequency of each n-gram, for smoothed IDF weights
+        counts = np.zeros((len(phrases), len(self.vocab)), dtype=np.float32)
+        for row, (_, phrase) in enumerate(phrases):
+            np.add.at(counts[row], self._indices(phrase), 1)
+        df = np.count_nonzero(counts, axis=0)
+        self.idf = (np.log((1 + len(phrases)) / (1 + df)) + 1).astype(np.float32)
+        # The weight of an n-gram found in no example
+        self.oov_idf = float(np.log(1 + len(phrases)) + 1)
+
+        # Weighted, normalized example vectors, averaged into per-intent centroids
+        vectors = self._normalize(counts * self.idf)
+        row_labels = np.array([self.labels.index(label) for label, _ in phrases])
+        centroids = np.stack([vectors[row_labels == i].mean(axis=0) for i in range(len(self.labels))])
+        # Stored transposed (vocab x intents) so a query's n-gram rows can be gathered directly
+        self.centroids_t = np.ascontiguousarray(self._normalize(centroids).T)
+
+    @staticmethod
+    def _normalize(matrix):
+        """L2-normalizes each row, leaving all-zero rows as they are."""
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    def _indices(self, text):
+        """Returns the vocabulary indices of the known n-grams in a text."""
+        return np.fromiter(
+            (self.vocab[g] for g in _ngrams(text) if g in self.vocab), dtype=np.intp
+        )
+
+    def _oov_mass(self, text):
+        """Returns the squared length that a text's unknown n-grams add to its vector."""
+        counts = collections.Counter(g for g in _ngrams(text) if g not in self.vocab)
+        return sum(c * c for c in counts.values()) * self.oov_idf ** 2
+
+    def classify(self, text):
+        """
+        Classifies a single query.
+
+        Returns:
+            tuple[str or None, float]: The best intent and its cosine similarity
+            (0-1), or (None, 0.0) if the query shares nothing with the examples.
+        """
+        idx, counts = np.unique(self._indices(text), return_counts=True)
+        if idx.size == 0:
+            return None, 0.0
+        # Only the rows for n-grams in the query contribute to the dot product,
+        # but unknown n-grams still add to the query's length
+        weights = counts * self.idf[idx]
+        norm = np.sqrt(np.dot(weights, weights) + self._oov_mass(text))
+        scores = weights @ self.centroids_t[idx] / norm
+        best = int(np.argmax(scores))
+        return self.labels[best], float(scores[best])
+
+    def classify_batch(self, texts):
+        """
+        Classifies several queries with a single matrix multiplication.
+
+        Returns:
+            list[tuple[str or None, float]]: One (intent, score) pair per query.
+        """
+        counts = np.zeros((len(texts), len(self.vocab)), dtype=np.float32)
+        oov = np.zeros(len(texts), dtype=np.float32)
+        for row, text in enumerate(texts):
+            np.add.at(counts[row], self._indices(text), 1)
+            oov[row] = self._oov_mass(text)
+        weights = counts * self.idf
+        norms = np.sqrt(np.einsum("ij,ij->i", weights, weights) + oov)
+        scores = (weights @ self.centroids_t) / np.where(norms == 0, 1, norms)[:, None]
+        best = np.argmax(scores, axis=1)
+        return [
+            (self.labels[b], float(scores[row, b])) if counts[row].any() else (None, 0.0)
+            for row, b in enumerate(best)
+        ]
+
+# Built once at import so classification at runtime is just a lookup and a dot product
+_classifier = IntentClassifier()
+
+def classify(text):
+    """Classifies one query with the shared classifier. See IntentClassifier.classify."""
+    return _classifier.classify(text)
+
+def classify_batch(texts):
+    """Classifies several queries with the shared classifier. See IntentClassifier.classify_batch."""
+    return _classifier.classify_batch(texts)
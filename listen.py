@@ -3,47 +3,153 @@
 # ------------------------------------------------------------------------------
 # This module handles all speech recognition tasks for the assistant.
 # It uses the SpeechRecognition library to capture audio from the microphone
-# and transcribe it into text using an online API (Google Web Speech).
+# and transcribe it into text using an online API (Google Web Speech), or
+# another recognizer backend chosen with RECOGNIZER_BACKEND in config.py.
 # ==============================================================================
 
+import time
+import threading
 import speech_recognition as sr
+import preprocess
+from config import (
+    LISTEN_RECALIBRATE_SECONDS, RECOGNIZER_BACKEND, RECOGNIZER_LANGUAGE, PREPROCESS_AUDIO,
+    NBEST_RESCORING
+)
 
-def listen():
+# A single recognizer is kept for the whole session so that its calibrated
+# energy threshold carries over from one listen() call to the next
+_recognizer = sr.Recognizer()
+# Set a pause threshold to determine the end of a phrase
+_recognizer.pause_threshold = 1
+
+# Held while the microphone is open, so calibration and listening never overlap
+_mic_lock = threading.Lock()
+# When the recognizer was last calibrated (time.monotonic()), or None if never
+_last_calibrated = None
+
+# Recognizer backends that can be selected with RECOGNIZER_BACKEND, mapped to
+# the sr.Recognizer method that implements each one. Sphinx and Whisper run
+# locally and need their own packages installed (pocketsphinx, openai-whisper).
+BACKENDS = {
+    "google": "recognize_google",
+    "sphinx": "recognize_sphinx",
+    "whisper": "recognize_whisper",
+}
+
+# Number of audio buffer reads since startup. Each read wakes the process up,
+# so the idle monitor (see idle.py) uses this to report wakeups per hour.
+frame_reads = 0
+
+class _CountingStream:
+    """Wraps a microphone stream to count how often it is read."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def read(self, size):
+        global frame_reads
+        frame_reads += 1
+        return self.stream.read(size)
+
+    def close(self):
+        self.stream.close()
+
+def _calibrate_source(source):
+    """Calibrates the recognizer to the ambient noise level of an open source."""
+    global _last_calibrated
+    _recognizer.adjust_for_ambient_noise(source, duration=1)
+    _last_calibrated = time.monotonic()
+
+def needs_calibration():
+    """Returns True if the recognizer has not been calibrated recently."""
+    return _last_calibrated is None or time.monotonic() - _last_calibrated > LISTEN_RECALIBRATE_SECONDS
+
+def energy_threshold():
+    """Returns the calibrated energy level above which audio counts as speech."""
+    return _recognizer.energy_threshold
+
+def calibrate(blocking=True, after=None, timeout=None):
+    """
+    Calibrates the recognizer to the ambient noise level ahead of time.
+
+    Args:
+        blocking (bool): If False and the microphone is already in use,
+            return immediately instead of waiting for it.
+        after (threading.Event): Wait for this to be set before calibrating.
+            The microphone is reserved while waiting, so a listen() that
+            starts in the meantime waits for the calibration and then reuses
+            it instead of calibrating on its own.
+        timeout (float): Seconds to wait for `after`. Defaults to no limit.
+
+    Returns:
+        bool: True if calibration ran, False if the microphone was busy or
+        `after` was not set in time.
+    """
+    if not _mic_lock.acquire(blocking=blocking):
+        return False
+    try:
+        if after is not None and not after.wait(timeout):
+            return False
+        with sr.Microphone() as source:
+            _calibrate_source(source)
+        return True
+    finally:
+        _mic_lock.release()
+
+def listen(rescore=True):
     """
     Listens for a command from the user via microphone and transcribes it to text.
 
     This function actively listens for a single utterance, adjusts for ambient noise
     to improve accuracy, and uses Google's Web Speech API for transcription.
+    Calibration is skipped if it was done within LISTEN_RECALIBRATE_SECONDS.
+
+    Args:
+        rescore (bool): Pick the most command-like of the recognizer's
+            alternatives (see rescore.py). Pass False when the answer is free
+            text, such as a dialog reply, so the recognizer's top guess is kept.
 
     Returns:
         str or None: The transcribed text in lowercase if successful, otherwise None.
     """
-    # Initialize the recognizer
-    r = sr.Recognizer()
-    
     # Use the default microphone as the audio source
-    with sr.Microphone() as source:
+    with _mic_lock, sr.Microphone() as source:
         print("Listening...")
-        
-        # Set a pause threshold to determine the end of a phrase
-        r.pause_threshold = 1
+        source.stream = _CountingStream(source.stream)
         
         # Calibrate the recognizer to the ambient noise level for better accuracy
-        r.adjust_for_ambient_noise(source, duration=1)
+        if needs_calibration():
+            _calibrate_source(source)
         
         try:
             # Listen for the user's input. The timeout and phrase_time_limit
             # prevent the recognizer from waiting indefinitely.
-            audio = r.listen(source, timeout=5, phrase_time_limit=10)
+            audio = _recognizer.listen(source, timeout=5, phrase_time_limit=10)
         except sr.WaitTimeoutError:
             print("Listening timed out while waiting for phrase to start.")
             return None
 
-    # --- Try to recognize the speech using Google's online service ---
+    return recognize(audio, rescore=rescore)
+
+def recognize(audio, r=None, rescore=True):
+    """
+    Transcribes captured audio to text.
+
+    This is shared by listen() and by any other capture path (such as the
+    barge-in monitor) so that all audio goes through the same recognizer.
+
+    Args:
+        audio (sr.AudioData): The captured audio.
+        r (sr.Recognizer): The recognizer to use. Defaults to the shared recognizer.
+        rescore (bool): Rescore the alternatives against the commands (see listen()).
+
+    Returns:
+        str or None: The transcribed text in lowercase if successful, otherwise None.
+    """
+    # --- Try to recognize the speech using the configured service ---
     try:
         print("Recognizing...")
-        # Use Google's API to transcribe the audio to text
-        query = r.recognize_google(audio, language='en-in')
+        query = transcribe(audio, r, rescore=rescore)
         print(f"User said: {query}")
         # Return the transcribed text in lowercase
         return query.lower()
@@ -63,3 +169,55 @@ def listen():
         print(f"An unexpected error occurred during speech recognition: {e}")
         return None
 
+
+def transcribe(audio, r=None, backend=RECOGNIZER_BACKEND, language=RECOGNIZER_LANGUAGE,
+               clean_audio=PREPROCESS_AUDIO, raw_alternatives=False, rescore=True):
+    """
+    Transcribes audio with a recognizer backend, without any error handling.
+
+    recognize() wraps this for the live assistant; batch tools (see
+    transcribe.py) call it directly so they can count each kind of failure.
+
+    Args:
+        audio (sr.AudioData): The captured audio.
+        r (sr.Recognizer): The recognizer to use. Defaults to the shared recognizer.
+        backend (str): A key of BACKENDS.
+        language (str): The language code, e.g. "en-in".
+        clean_audio (bool): Run the audio through preprocess.process() first.
+        raw_alternatives (bool): Return Google's list of alternative
+            transcripts instead of choosing one (used by rescore.py).
+        rescore (bool): With the Google backend and NBEST_RESCORING on, return
+            the alternative chosen by rescore.best_transcript() rather than
+            simply the first one. Only suitable when a command is expected.
+
+    Returns:
+        str: The transcribed text, as returned by the backend.
+
+    Raises:
+        sr.UnknownValueError: If the speech could not be understood.
+        sr.RequestError: If the recognition service could not be reached.
+    """
+    r = r or _recognizer
+    if clean_audio:
+        audio = preprocess.process(audio)
+        if audio is None:
+            # Nothing but silence, so don't spend a round trip on it
+            raise sr.UnknownValueError()
+    method = getattr(r, BACKENDS[backend])
+    if backend == "whisper":
+        # Whisper takes a language name rather than a locale code
+        return method(audio, language="english" if language.startswith("en") else None)
+    if backend == "google" and ((NBEST_RESCORING and rescore) or raw_alternatives):
+        result = method(audio, language=language, show_all=True)
+        # An empty result means nothing was recognized
+        if not result or not result.get("alternative"):
+            raise sr.UnknownValueError()
+        if raw_alternatives:
+            return result["alternative"]
+        # Imported here because rescore pulls in the dispatcher and every command
+        import rescore
+        return rescore.best_transcript(result["alternative"])
+    if backend == "sphinx" and language.startswith("en"):
+        # Sphinx only ships a US English model
+        language = "en-US"
+    return method(audio, language=language)
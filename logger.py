@@ -6,12 +6,17 @@
 # start times, and any errors that occur, creating a persistent log file.
 # ==============================================================================
 
+import re
 import logging
 from datetime import datetime
 
 # Define the name of the log file
 LOG_FILE = "assistant_log.txt"
 
+# Matches the query lines written by log_command(), read back as bytes by
+# history.py and warmup.py. The groups are the date, the hour and the query.
+QUERY_LINE = re.compile(rb"^(\d{4}-\d{2}-\d{2}) (\d{2}):\d{2}:\d{2} - \w+ - User Query: '(.*)'\r?$")
+
 # --- Configure the Python logging module ---
 # This setup is done once when the module is first imported.
 logging.basicConfig(
@@ -45,6 +50,12 @@ def log_command(user_query, assistant_response, status="INFO"):
     logging.log(level, f"User Query: '{user_query or 'No input detected'}'")
     logging.log(level, f"Assistant Response: '{assistant_response}' | Status: {status}")
 
+    # Have the history index (see history.py) pick up the new entry. The
+    # indexing runs on a background thread, so logging doesn't wait for it.
+    # Imported here because history.py imports this module.
+    import history
+    history.notify()
+
 def start_session():
     """
     Logs a formatted separator to the log file, marking the beginning of a new
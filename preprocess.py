@@ -0,0 +1,250 @@
+# ==============================================================================
+# preprocess.py
+# ------------------------------------------------------------------------------
+# This module cleans up captured audio before it is sent for recognition:
+#   1. Converts it to 16 kHz mono. Speech recognition needs nothing above
+#      8 kHz, and most microphones capture at 44.1 or 48 kHz.
+#   2. Removes low-frequency rumble (fans, desk bumps) with a high-pass filter.
+#   3. Reduces steady background noise with spectral subtraction.
+#   4. Evens out the volume (automatic gain control).
+#   5. Trims the silence before and after the speech.
+#
+# The result is a smaller upload (the recognizer encodes it as FLAC) and fewer
+# "could not understand" results in noisy rooms. All steps are vectorized
+# with NumPy, so a few seconds of audio take a few milliseconds.
+#
+# Run "python preprocess.py recordings/" to compare upload size and
+# recognition time with and without preprocessing.
+# ==============================================================================
+
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+import speech_recognition as sr
+
+from config import (
+    PREPROCESS_SAMPLE_RATE, PREPROCESS_HIGHPASS_HZ, PREPROCESS_NOISE_REDUCTION,
+    PREPROCESS_TARGET_DBFS, PREPROCESS_TRIM_PADDING
+)
+
+# Short-time Fourier transform settings: 32 ms frames with 50% overlap at 16 kHz
+_FRAME = 512
+_HOP = 256
+# The quietest share of frames is taken to be background noise
+_NOISE_PERCENTILE = 10
+# Subtracted magnitudes never go below this share of the original, which
+# avoids the "musical noise" artifacts of full subtraction
+_SPECTRAL_FLOOR = 0.03
+# Frames this many dB below the loudest frame count as silence when trimming
+_SILENCE_DB = 30
+
+def to_array(audio):
+    """Converts sr.AudioData to float samples in the range -1 to 1."""
+    raw = audio.get_raw_data(convert_width=2)
+    return np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+
+def to_audio_data(samples, sample_rate):
+    """Converts float samples back to 16-bit sr.AudioData."""
+    pcm = np.clip(samples * 32768.0, -32768, 32767).astype("<i2")
+    return sr.AudioData(pcm.tobytes(), sample_rate, 2)
+
+def resample(samples, rate, new_rate):
+    """
+    Resamples audio using the FFT, which also removes frequencies the new rate can't hold.
+    """
+    if rate == new_rate or len(samples) == 0:
+        return samples
+    new_length = int(round(len(samples) * new_rate / rate))
+    spectrum = np.fft.rfft(samples)
+    # Keep (or zero-pad to) the bins that fit below the new Nyquist frequency
+    bins = new_length // 2 + 1
+    if bins <= len(spectrum):
+        spectrum = spectrum[:bins]
+    else:
+        spectrum = np.concatenate([spectrum, np.zeros(bins - len(spectrum), dtype=spectrum.dtype)])
+    return (np.fft.irfft(spectrum, new_length) * (new_length / len(samples))).astype(np.float32)
+
+def _stft(samples):
+    """Splits audio into windowed, overlapping frames and returns their spectra."""
+    padded = np.concatenate([samples, np.zeros(_FRAME, dtype=np.float32)])
+    count = 1 + (len(padded) - _FRAME) // _HOP
+    # Build the frame matrix with stride tricks instead of a Python loop
+    frames = np.lib.stride_tricks.as_strided(
+        padded, shape=(count, _FRAME), strides=(padded.strides[0] * _HOP, padded.strides[0])
+    )
+    return np.fft.rfft(frames * np.hanning(_FRAME).astype(np.float32), axis=1)
+
+def _istft(spectra, length):
+    """Rebuilds audio from frame spectra by overlap-adding the frames."""
+    window = np.hanning(_FRAME).astype(np.float32)
+    frames = np.fft.irfft(spectra, _FRAME, axis=1) * window
+    count = len(frames)
+    output = np.zeros(_HOP * (count - 1) + _FRAME, dtype=np.float32)
+    norm = np.zeros_like(output)
+    # With 50% overlap, even and odd frames each tile the signal without overlapping,
+    # so each half can be added in one vectorized step
+    for start in (0, 1):
+        chosen = frames[start::2]
+        offset = start * _HOP
+        span = len(chosen) * _FRAME
+        output[offset:offset + span] += chosen.reshape(-1)
+        norm[offset:offset + span] += np.tile(window ** 2, len(chosen))
+    return (output / np.maximum(norm, 1e-3))[:length]
+
+def denoise(samples, rate, highpass_hz=PREPROCESS_HIGHPASS_HZ, strength=PREPROCESS_NOISE_REDUCTION):
+    """
+    Applies the high-pass filter and spectral subtraction in one pass.
+
+    Args:
+        samples (np.ndarray): Float samples.
+        rate (int): Sample rate in Hz.
+        highpass_hz (float): Frequencies below this are removed.
+        strength (float): How many times the estimated noise is subtracted.
+
+    Returns:
+        np.ndarray: The cleaned samples.
+    """
+    if len(samples) < _FRAME:
+        return samples
+    spectra = _stft(samples)
+    magnitude = np.abs(spectra)
+
+    # Estimate the noise spectrum from the quietest frames
+    frame_energy = magnitude.sum(axis=1)
+    quiet = frame_energy <= np.percentile(frame_energy, _NOISE_PERCENTILE)
+    noise = magnitude[quiet].mean(axis=0)
+
+    cleaned = np.maximum(magnitude - strength * noise, _SPECTRAL_FLOOR * magnitude)
+    # High-pass: drop the bins below the cutoff
+    cleaned[:, :int(highpass_hz * _FRAME / rate) + 1] = 0
+    gain = cleaned / np.maximum(magnitude, 1e-10)
+    return _istft(spectra * gain, len(samples))
+
+def _frame_rms(samples, frame):
+    """Returns the RMS level of consecutive non-overlapping frames."""
+    count = len(samples) // frame
+    if count == 0:
+        return np.zeros(0, dtype=np.float32)
+    return np.sqrt(np.mean(samples[:count * frame].reshape(count, frame) ** 2, axis=1))
+
+def trim_silence(samples, rate, padding=PREPROCESS_TRIM_PADDING):
+    """
+    Removes the silence before and after the speech.
+
+    Returns:
+        np.ndarray: The trimmed samples, empty if there is no speech at all.
+    """
+    frame = rate // 100  # 10 ms
+    levels = _frame_rms(samples, frame)
+    if len(levels) == 0 or levels.max() <= 0:
+        return samples[:0]
+    threshold = levels.max() * 10 ** (-_SILENCE_DB / 20)
+    active = np.flatnonzero(levels > threshold)
+    pad = int(padding * rate)
+    start = max(0, active[0] * frame - pad)
+    end = min(len(samples), (active[-1] + 1) * frame + pad)
+    return samples[start:end]
+
+def normalize_gain(samples, rate, target_dbfs=PREPROCESS_TARGET_DBFS):
+    """
+    Scales the audio so its speech is at a steady level, without clipping.
+
+    The level is measured over the louder half of 30 ms frames, so pauses
+    between words don't make quiet speakers get boosted too much.
+    """
+    levels = _frame_rms(samples, int(rate * 0.03))
+    if len(levels) == 0 or levels.max() <= 0:
+        return samples
+    speech_level = np.sqrt(np.mean(np.square(levels[levels >= np.median(levels)])))
+    gain = 10 ** (target_dbfs / 20) / speech_level
+    # Never let the loudest sample clip
+    peak = np.abs(samples).max()
+    gain = min(gain, 0.99 / peak)
+    return samples * gain
+
+def process(audio, sample_rate=PREPROCESS_SAMPLE_RATE):
+    """
+    Runs every preprocessing step on captured audio.
+
+    Args:
+        audio (sr.AudioData): The captured audio.
+        sample_rate (int): The output sample rate, in Hz.
+
+    Returns:
+        sr.AudioData or None: The cleaned 16-bit mono audio, or None if it
+        contains no speech at all.
+    """
+    samples = resample(to_array(audio), audio.sample_rate, sample_rate)
+    samples = denoise(samples, sample_rate)
+    samples = trim_silence(samples, sample_rate)
+    if len(samples) == 0:
+        return None
+    return to_audio_data(normalize_gain(samples, sample_rate), sample_rate)
+
+# --- Benchmark ---
+
+def benchmark(directory, recognize=True):
+    """
+    Compares upload size and recognition time with and without preprocessing.
+
+    Args:
+        directory (str): A folder of WAV or FLAC recordings.
+        recognize (bool): Also send both versions to the recognizer. If False,
+            only sizes and preprocessing time are measured.
+
+    Returns:
+        dict: Per-file results and totals.
+    """
+    import listen
+    from transcribe import find_recordings
+
+    files = []
+    for path in find_recordings(directory):
+        with sr.AudioFile(path) as source:
+            original = sr.Recognizer().record(source)
+        started = time.perf_counter()
+        cleaned = process(original)
+        result = {
+            "file": path,
+            "preprocess_seconds": round(time.perf_counter() - started, 4),
+            # This is the payload recognize_google uploads
+            "bytes_before": len(original.get_flac_data(convert_width=2)),
+            "bytes_after": len(cleaned.get_flac_data()) if cleaned else 0,
+        }
+        if recognize:
+            for label, audio in (("before", original), ("after", cleaned)):
+                started = time.perf_counter()
+                try:
+                    if audio is None:
+                        raise sr.UnknownValueError()
+                    result[f"transcript_{label}"] = listen.transcribe(audio, clean_audio=False).lower()
+                except (sr.UnknownValueError, sr.RequestError) as e:
+                    result[f"transcript_{label}"] = None
+                    result[f"error_{label}"] = type(e).__name__
+                result[f"recognize_seconds_{label}"] = round(time.perf_counter() - started, 4)
+        files.append(result)
+
+    totals = {"files": len(files)}
+    for key in ("bytes_before", "bytes_after", "preprocess_seconds",
+                "recognize_seconds_before", "recognize_seconds_after"):
+        if files and key in files[0]:
+            totals[key] = round(sum(f[key] for f in files), 4)
+    if recognize:
+        for label in ("before", "after"):
+            totals[f"not_recognized_{label}"] = sum(f[f"transcript_{label}"] is None for f in files)
+    return {"files": files, "totals": totals}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark audio preprocessing on recorded commands.")
+    parser.add_argument("directory")
+    parser.add_argument("--no-recognize", action="store_true", help="Only measure sizes, not recognition")
+    args = parser.parse_args(argv)
+    report = benchmark(args.directory, recognize=not args.no_recognize)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
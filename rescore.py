@@ -0,0 +1,265 @@
+# ==============================================================================
+# rescore.py
+# ------------------------------------------------------------------------------
+# This module picks the best transcript from the recognizer's list of
+# alternatives (its "n-best" list) instead of always taking the first one.
+#
+# Google's recognizer often hears a command correctly in its second or third
+# guess, or splits a name into sound-alike words ("open web site get hub").
+# Each alternative is first corrected against the words the assistant knows
+# (command keywords and the app, website, contact and city names in config.py),
+# then resolved by the dispatcher without being run. The alternative that
+# resolves to a complete command wins, with the recognizer's own confidence
+# breaking ties, so a near miss no longer costs the user a whole extra turn.
+#
+# Run "python rescore.py recordings/ --save nbest.jsonl" to record the
+# alternatives for a corpus, and "python rescore.py --nbest nbest.jsonl" to
+# measure how many "not understood" turns rescoring saves.
+# ==============================================================================
+
+import os
+import sys
+import json
+import difflib
+import argparse
+
+from dispatcher import resolve, NOT_UNDERSTOOD
+from config import APP_PATHS, WEBSITE_URLS, CONTACTS, KNOWN_CITIES, RESCORE_FUZZY_MIN
+
+# The keywords dispatcher._match_keywords looks for. Recognizers often split
+# these into two words ("web site", "screen shot"), which breaks the match.
+COMMAND_WORDS = (
+    "weather", "news", "wikipedia", "search", "task", "list", "complete", "timer",
+    "calculate", "time", "date", "joke", "website", "open", "volume", "brightness",
+    "screenshot", "screenshots", "restart", "sleep", "shutdown", "email", "play",
+    "music", "pause", "next", "track", "goodbye",
+)
+
+# Parameters that only work with a known name: an app or website that isn't
+# listed can't be opened, so an unknown name is a sign of a misrecognition
+_KNOWN_ARGUMENTS = {
+    "open_app": APP_PATHS,
+    "open_website": WEBSITE_URLS,
+}
+
+# Parameters that accept any name, where a known one only breaks near-ties.
+# The weather works for any city, so an unlisted city is no reason to prefer
+# a less confident alternative.
+_FAMILIAR_ARGUMENTS = {
+    "get_weather": KNOWN_CITIES,
+}
+
+# Ranks of how complete a resolved command is. Higher is better.
+_NOT_UNDERSTOOD, _INCOMPLETE, _UNKNOWN_NAME, _COMMAND, _KNOWN_NAME = range(5)
+
+# How much a familiar name adds to an alternative's confidence. Only
+# alternatives this close in confidence can be reordered by it.
+_FAMILIAR_BONUS = 0.05
+
+# Alternatives after the first usually have no confidence score, so each
+# later rank is assumed to be this much less likely than the one before
+_RANK_DECAY = 0.8
+
+def _vocabulary():
+    """Returns every known term, mapped from its spelling without spaces."""
+    terms = list(COMMAND_WORDS) + list(APP_PATHS) + list(WEBSITE_URLS) + list(CONTACTS) + list(KNOWN_CITIES)
+    return {term.replace(" ", ""): term for term in terms}
+
+_VOCABULARY = _vocabulary()
+
+def _closest_term(joined):
+    """Returns the known term that a run of words sounds like and how closely, or (None, 0)."""
+    best, best_ratio = None, RESCORE_FUZZY_MIN
+    for compact, term in _VOCABULARY.items():
+        if abs(len(compact) - len(joined)) > 3:
+            continue
+        matcher = difflib.SequenceMatcher(None, joined, compact)
+        # The cheap upper bounds rule out most terms before the full comparison
+        if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+            continue
+        ratio = matcher.ratio()
+        if ratio >= best_ratio:
+            best, best_ratio = term, ratio
+    return (best, best_ratio) if best else (None, 0)
+
+def correct(text):
+    """
+    Replaces runs of words that sound like a known term with that term.
+
+    Spans of up to three words are joined and compared with the vocabulary.
+    The closest match wins (the longer span on a tie), so "open web site get
+    hub" becomes "open website github".
+
+    Args:
+        text (str): A transcript in lowercase.
+
+    Returns:
+        str: The corrected transcript.
+    """
+    words = text.split()
+    corrected = []
+    i = 0
+    while i < len(words):
+        # (ratio, span, term) of the best match starting at this word
+        best = (0, 0, None)
+        for span in (3, 2, 1):
+            joined = "".join(words[i:i + span])
+            if i + span > len(words) or len(joined) < 4:
+                continue
+            term, ratio = _closest_term(joined)
+            if term and (ratio, span) > best[:2]:
+                best = (ratio, span, term)
+        ratio, span, term = best
+        # Don't swallow a leading word ("a screen shot", "my list") when the
+        # rest of the span matches at least as well without it
+        rest = "".join(words[i + 1:i + span])
+        if term and span > 1 and len(rest) >= 4 and _closest_term(rest)[1] >= ratio:
+            term = None
+        if term:
+            corrected.append(term)
+            i += span
+        else:
+            corrected.append(words[i])
+            i += 1
+    return " ".join(corrected)
+
+def _completeness(route):
+    """Ranks how fully a route was understood (see the _NOT_UNDERSTOOD.. ranks)."""
+    if route.name == NOT_UNDERSTOOD:
+        return _NOT_UNDERSTOOD
+    if route.status in ("Missing Information", "Invalid Parameter"):
+        return _INCOMPLETE
+    known = _KNOWN_ARGUMENTS.get(route.name)
+    args = getattr(route.call, "args", None)
+    if known is None or not args:
+        return _COMMAND
+    return _KNOWN_NAME if args[0] in known else _UNKNOWN_NAME
+
+def _familiar(route):
+    """Returns True if a route's argument is a listed name for a command that takes any name."""
+    familiar = _FAMILIAR_ARGUMENTS.get(route.name)
+    args = getattr(route.call, "args", None)
+    return bool(familiar and args and args[0] in familiar)
+
+def rank(alternatives):
+    """
+    Scores every alternative transcript.
+
+    Args:
+        alternatives (list[dict]): The "alternative" list from
+            recognize_google(show_all=True); each has a "transcript" and the
+            first usually has a "confidence".
+
+    Returns:
+        list[tuple]: (completeness, score, transcript, route name) for each
+        candidate, best first. The score is the confidence, plus a little for
+        a familiar city. Each alternative is tried as heard and as corrected.
+    """
+    top_confidence = alternatives[0].get("confidence", 0.9) if alternatives else 0
+    candidates = []
+    for position, alternative in enumerate(alternatives):
+        heard = alternative["transcript"].lower().strip()
+        confidence = alternative.get("confidence", top_confidence * _RANK_DECAY ** position)
+        for text in dict.fromkeys((heard, correct(heard))):
+            route = resolve(text, None)
+            score = confidence + (_FAMILIAR_BONUS if _familiar(route) else 0)
+            candidates.append((_completeness(route), score, text, route.name))
+    # Python's sort is stable, so equal candidates keep the recognizer's order
+    return sorted(candidates, key=lambda c: (c[0], c[1]), reverse=True)
+
+def best_transcript(alternatives):
+    """
+    Picks the most actionable transcript from the recognizer's alternatives.
+
+    Returns:
+        str: The chosen transcript, in lowercase.
+    """
+    return rank(alternatives)[0][2]
+
+# --- Evaluation ---
+
+def record_corpus(directory, output):
+    """
+    Saves the recognizer's alternatives for every recording in a directory.
+
+    Each line of the output has the file, its alternatives and, if a sidecar
+    .txt file exists, the expected transcript.
+    """
+    import speech_recognition as sr
+    import listen
+    from transcribe import find_recordings, read_expected
+
+    recognizer = sr.Recognizer()
+    for path in find_recordings(directory):
+        with sr.AudioFile(path) as source:
+            audio = recognizer.record(source)
+        try:
+            result = listen.transcribe(audio, recognizer, raw_alternatives=True)
+        except (sr.UnknownValueError, sr.RequestError) as e:
+            print(f"{path}: {e or type(e).__name__}", file=sys.stderr)
+            result = []
+        output.write(json.dumps({"file": path, "alternatives": result, "expected": read_expected(path)}) + "\n")
+
+def evaluate(entries):
+    """
+    Compares taking the first transcript with rescoring, on recorded alternatives.
+
+    Args:
+        entries (list[dict]): Lines written by record_corpus().
+
+    Returns:
+        dict: How many turns each approach left not understood or incomplete,
+        and, where an expected transcript is known, how often each resolved
+        to the same command as the expected transcript.
+    """
+    report = {"turns": 0, "changed": 0}
+    for approach in ("top", "rescored"):
+        report[approach] = {"not_understood": 0, "incomplete": 0, "correct_command": 0, "scored": 0}
+
+    for entry in entries:
+        alternatives = entry["alternatives"]
+        if not alternatives:
+            continue
+        report["turns"] += 1
+        expected = resolve(entry["expected"].lower(), None).name if entry.get("expected") else None
+        choices = {
+            "top": alternatives[0]["transcript"].lower().strip(),
+            "rescored": best_transcript(alternatives),
+        }
+        report["changed"] += choices["top"] != choices["rescored"]
+        for approach, text in choices.items():
+            route = resolve(text, None)
+            completeness = _completeness(route)
+            counts = report[approach]
+            counts["not_understood"] += completeness == _NOT_UNDERSTOOD
+            counts["incomplete"] += completeness == _INCOMPLETE
+            if expected is not None:
+                counts["scored"] += 1
+                counts["correct_command"] += route.name == expected
+
+    report["not_understood_saved"] = report["top"]["not_understood"] - report["rescored"]["not_understood"]
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate n-best transcript rescoring.")
+    parser.add_argument("directory", nargs="?", help="Recordings to send to the recognizer")
+    parser.add_argument("--save", help="Write the recognizer's alternatives to this JSONL file")
+    parser.add_argument("--nbest", help="Evaluate a JSONL file saved earlier with --save")
+    args = parser.parse_args(argv)
+
+    if args.directory:
+        if not os.path.isdir(args.directory):
+            parser.error(f"{args.directory} is not a directory")
+        path = args.save or "nbest.jsonl"
+        with open(path, "w", encoding="utf-8") as f:
+            record_corpus(args.directory, f)
+        args.nbest = path
+    if not args.nbest:
+        parser.error("give a directory of recordings or --nbest")
+
+    with open(args.nbest, "r", encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    print(json.dumps(evaluate(entries), indent=2))
+
+if __name__ == "__main__":
+    main()
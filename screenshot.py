@@ -0,0 +1,185 @@
+# ==============================================================================
+# screenshot.py
+# ------------------------------------------------------------------------------
+# This module captures and encodes screenshots in the background. Grabbing the
+# screen and compressing the image (which can take a long time for a large PNG)
+# are handed off to a small pool of encoder threads, so the assistant can reply
+# straight away that it is taking the screenshot. Any failure is written to the
+# assistant log and passed to an on_error callback, so the user hears about it.
+# It also supports a "burst" mode that takes a series of screenshots at a fixed
+# interval without dropping any frames.
+# ==============================================================================
+
+import time
+import logging
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from config import (
+    SCREENSHOT_FORMAT, SCREENSHOT_COMPRESS_LEVEL, SCREENSHOT_QUALITY, SCREENSHOT_WORKERS
+)
+
+# Maps the spoken/configured format name to the Pillow format and file extension
+FORMATS = {
+    "png": ("PNG", "png"),
+    "jpeg": ("JPEG", "jpg"),
+    "jpg": ("JPEG", "jpg"),
+    "webp": ("WEBP", "webp"),
+}
+
+# The shared pool of encoder threads. Pillow releases the GIL while it
+# compresses image data, so several frames can be encoded at the same time.
+_encoder_pool = ThreadPoolExecutor(max_workers=SCREENSHOT_WORKERS, thread_name_prefix="screenshot")
+
+def _default_grab():
+    """Grabs the screen with pyautogui. Imported lazily so other image sources work headless."""
+    import pyautogui
+    return pyautogui.screenshot()
+
+def _save_options(pil_format, compress_level, quality):
+    """
+    Builds the Pillow save() keyword arguments for the given format.
+
+    Args:
+        pil_format (str): The Pillow format name ('PNG', 'JPEG' or 'WEBP').
+        compress_level (int): zlib level for PNG (0-9). Lower is faster.
+        quality (int): Quality for lossy formats (1-100).
+
+    Returns:
+        dict: The keyword arguments to pass to Image.save().
+    """
+    if pil_format == "PNG":
+        # optimize=True runs extra compression passes, so keep it off for speed
+        return {"compress_level": compress_level, "optimize": False}
+    if pil_format == "JPEG":
+        return {"quality": quality}
+    # WebP: method 0 is the fastest encoder setting
+    return {"quality": quality, "method": 0}
+
+def _encode(image, filename, pil_format, options):
+    """Saves one captured image to disk. Runs on an encoder thread."""
+    # JPEG cannot store an alpha channel, so drop it if the source has one
+    if pil_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    image.save(filename, format=pil_format, **options)
+    return filename
+
+def _grab_and_encode(grab, filename, pil_format, options):
+    """Grabs a frame and encodes it. Runs on an encoder thread."""
+    return _encode(grab(), filename, pil_format, options)
+
+def _resolve_format(fmt):
+    """Returns the (Pillow format, extension) pair for a format name."""
+    fmt = (fmt or SCREENSHOT_FORMAT).lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported screenshot format: {fmt}")
+    return FORMATS[fmt]
+
+def _report_failure(filename, error, on_error):
+    """Logs a screenshot that couldn't be taken or saved, and tells the user."""
+    logging.error(f"Screenshot {filename} failed: {error}")
+    if on_error:
+        on_error(f"Sorry, the screenshot {filename} couldn't be saved.")
+
+def capture(fmt=None, compress_level=None, quality=None, grab=None, on_error=None):
+    """
+    Takes a single screenshot in the background.
+
+    Args:
+        fmt (str): 'png', 'jpeg' or 'webp'. Defaults to SCREENSHOT_FORMAT.
+        compress_level (int): PNG zlib level. Defaults to SCREENSHOT_COMPRESS_LEVEL.
+        quality (int): JPEG/WebP quality. Defaults to SCREENSHOT_QUALITY.
+        grab (callable): Returns a PIL image. Defaults to a pyautogui screen grab.
+        on_error (callable): Called with a message for the user if the
+            screenshot can't be taken or saved.
+
+    Returns:
+        str: The filename the screenshot will be saved as.
+        concurrent.futures.Future: Resolves to the filename once it is written.
+    """
+    pil_format, extension = _resolve_format(fmt)
+    options = _save_options(
+        pil_format,
+        SCREENSHOT_COMPRESS_LEVEL if compress_level is None else compress_level,
+        SCREENSHOT_QUALITY if quality is None else quality,
+    )
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    filename = f"screenshot_{timestamp}.{extension}"
+    future = _encoder_pool.submit(_grab_and_encode, grab or _default_grab, filename, pil_format, options)
+
+    def check(done):
+        if done.exception():
+            _report_failure(filename, done.exception(), on_error)
+    future.add_done_callback(check)
+    return filename, future
+
+def _run_burst(grab, filenames, interval, pil_format, options, on_error):
+    """
+    Grabs one frame per filename on a fixed schedule and queues each for encoding.
+
+    Frames are grabbed on this thread at start + i * interval, so the schedule
+    does not drift. Encoding happens on the pool, whose queue is unbounded, so a
+    slow encoder never causes a frame to be skipped. If a grab runs late, the
+    next one is taken immediately instead of being dropped. A grab that fails
+    is logged and the burst carries on; the user is told once, at the end, how
+    many screenshots are missing.
+
+    Returns:
+        list[str]: The filenames that couldn't be taken or saved.
+    """
+    futures = {}
+    failed = []
+    start = time.monotonic()
+    for i, filename in enumerate(filenames):
+        delay = start + i * interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        try:
+            image = grab()
+        except Exception as e:
+            logging.error(f"Screenshot {filename} failed: {e}")
+            failed.append(filename)
+            continue
+        futures[filename] = _encoder_pool.submit(_encode, image, filename, pil_format, options)
+
+    # Wait for the encoders so that joining this thread means every file is written
+    wait(futures.values())
+    for filename, future in futures.items():
+        if future.exception():
+            logging.error(f"Screenshot {filename} failed: {future.exception()}")
+            failed.append(filename)
+
+    if failed and on_error:
+        on_error(f"Sorry, {len(failed)} of {len(filenames)} screenshots couldn't be saved.")
+    return sorted(failed)
+
+def capture_burst(count, interval, fmt=None, compress_level=None, quality=None, grab=None,
+                  on_error=None):
+    """
+    Takes `count` screenshots, one every `interval` seconds, in the background.
+
+    Args:
+        count (int): The number of screenshots to take.
+        interval (float): The number of seconds between screenshots.
+        fmt, compress_level, quality, grab, on_error: See capture().
+
+    Returns:
+        list[str]: The filenames the screenshots will be saved as, in order.
+        threading.Thread: The burst thread. Joining it waits until every file is written.
+    """
+    pil_format, extension = _resolve_format(fmt)
+    options = _save_options(
+        pil_format,
+        SCREENSHOT_COMPRESS_LEVEL if compress_level is None else compress_level,
+        SCREENSHOT_QUALITY if quality is None else quality,
+    )
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    filenames = [f"screenshot_{timestamp}_{i + 1:03d}.{extension}" for i in range(count)]
+    thread = threading.Thread(
+        target=_run_burst,
+        args=(grab or _default_grab, filenames, interval, pil_format, options, on_error),
+        daemon=True,
+    )
+    thread.start()
+    return filenames, thread
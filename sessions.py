@@ -0,0 +1,424 @@
+# ==============================================================================
+# sessions.py
+# ------------------------------------------------------------------------------
+# This module runs several assistant sessions in one process, one per audio
+# source (for example one microphone per room), instead of one process per
+# room that each load every library and client.
+#
+# Each session has its own capture and recognition thread and its own
+# conversation state (a DialogManager), so a half-finished email in one room
+# doesn't affect another. Everything else is shared: the dispatcher and intent
+# classifier, the command time limits and worker pool, the response and song
+# caches, the Spotify and HTTP clients, and the to-do list (which is locked
+# while it is updated).
+#
+# Sources can be microphones, WAV files or raw audio streamed over TCP, and a
+# simulated source is included for benchmarks.
+#
+# Usage:
+#   python sessions.py devices                       # list the microphones
+#   python sessions.py run --mic 0 --mic 2 --wav test.wav --tcp 5000
+#   python sessions.py bench --sources 1 4 16        # memory benchmark
+# ==============================================================================
+
+import os
+import sys
+import json
+import time
+import wave
+import socket
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+import collections
+
+import numpy as np
+import speech_recognition as sr
+
+import listen
+from dialog import DialogManager
+from dispatcher import resolve, run, as_text
+from bargein import VoiceActivityDetector, record_phrase
+from logger import log_command
+
+# Every source delivers 16-bit mono audio in chunks of this many samples
+CHUNK = 1024
+
+# --- Audio sources ---
+
+class MicrophoneSource:
+    """Audio from a microphone, chosen by its index in `python sessions.py devices`."""
+
+    def __init__(self, device_index=None, sample_rate=16000):
+        self.name = f"mic-{device_index if device_index is not None else 'default'}"
+        self.device_index = device_index
+        self.sample_rate = sample_rate
+        self.sample_width = 2
+
+    def frames(self):
+        with sr.Microphone(device_index=self.device_index, sample_rate=self.sample_rate, chunk_size=CHUNK) as source:
+            while True:
+                yield source.stream.read(CHUNK)
+
+class WavSource:
+    """Audio from a 16-bit mono WAV file, delivered at its real speed by default."""
+
+    def __init__(self, path, realtime=True):
+        self.name = os.path.basename(path)
+        self.path = path
+        self.realtime = realtime
+        with wave.open(path, "rb") as f:
+            if f.getsampwidth() != 2 or f.getnchannels() != 1:
+                raise ValueError(f"{path} must be 16-bit mono audio")
+            self.sample_rate = f.getframerate()
+        self.sample_width = 2
+
+    def frames(self):
+        with wave.open(self.path, "rb") as f:
+            while True:
+                frame = f.readframes(CHUNK)
+                if not frame:
+                    return
+                if self.realtime:
+                    time.sleep(CHUNK / self.sample_rate)
+                yield frame
+
+class TcpSource:
+    """
+    Raw 16-bit mono PCM streamed over TCP. Waits for one client to connect.
+
+    For example: arecord -f S16_LE -r 16000 -c 1 -t raw | nc <host> 5000
+    """
+
+    def __init__(self, port, host="0.0.0.0", sample_rate=16000):
+        self.name = f"tcp-{port}"
+        self.address = (host, port)
+        self.sample_rate = sample_rate
+        self.sample_width = 2
+
+    def frames(self):
+        with socket.create_server(self.address) as server:
+            connection, _ = server.accept()
+            with connection:
+                while True:
+                    data = connection.recv(CHUNK * self.sample_width)
+                    if not data:
+                        return
+                    yield data
+
+class SimulatedSource:
+    """
+    Synthetic room audio for benchmarks: background noise with a burst of
+    speech-like sound every few seconds, delivered in real time.
+    """
+
+    def __init__(self, name, seconds, seed=0, sample_rate=16000, gap=4.0, utterance=1.0):
+        self.name = name
+        self.seconds = seconds
+        self.sample_rate = sample_rate
+        self.sample_width = 2
+        self.gap = gap
+        self.utterance = utterance
+        self._rng = np.random.default_rng(seed)
+
+    def frames(self):
+        period = int((self.gap + self.utterance) * self.sample_rate)
+        speech = int(self.utterance * self.sample_rate)
+        total = int(self.seconds * self.sample_rate)
+        # Start each source at a different point so they don't all talk at once
+        position = int(self._rng.integers(period))
+        started = time.monotonic()
+        for produced in range(0, total, CHUNK):
+            t = (position + produced + np.arange(CHUNK)) % period
+            samples = self._rng.normal(0, 60, CHUNK)
+            talking = t < speech
+            samples[talking] += 4000 * np.sin(2 * np.pi * 220 * t[talking] / self.sample_rate)
+            # Keep to real time
+            delay = started + (produced + CHUNK) / self.sample_rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            yield samples.astype("<i2").tobytes()
+
+# --- Sessions ---
+
+def _utterances(frames, sample_rate, sample_width, stopped, tick=None):
+    """
+    Splits a continuous audio stream into utterances.
+
+    Args:
+        frames (iterator[bytes]): Raw PCM chunks.
+        sample_rate (int): Sample rate in Hz.
+        sample_width (int): Bytes per sample.
+        stopped (threading.Event): Ends the stream when set.
+        tick (callable): Called about once a second while waiting for speech.
+
+    Yields:
+        sr.AudioData: Each utterance, with a short pre-roll.
+    """
+    bytes_per_second = sample_rate * sample_width
+    preroll = collections.deque()
+    preroll_bytes = 0
+    since_tick = 0
+    vad = VoiceActivityDetector()
+    for frame in frames:
+        if stopped.is_set():
+            return
+        preroll.append(frame)
+        preroll_bytes += len(frame)
+        while preroll_bytes - len(preroll[0]) > bytes_per_second * 0.5:
+            preroll_bytes -= len(preroll.popleft())
+
+        since_tick += len(frame)
+        if tick and since_tick >= bytes_per_second:
+            since_tick = 0
+            tick()
+
+        if vad.update(frame, sample_width):
+            yield record_phrase(frames, vad, list(preroll), sample_rate, sample_width)
+            preroll.clear()
+            preroll_bytes = 0
+            # Start the next utterance with a fresh speech count
+            vad = VoiceActivityDetector()
+
+def _print_response(session, query, text, status):
+    print(f"[{session.name}] {query!r} -> {text}")
+
+class Session:
+    """
+    One conversation: a source, its capture thread and its dialog state.
+
+    The command engine (dispatcher, caches, clients) is shared with every
+    other session in the process.
+    """
+
+    def __init__(self, source, on_response=_print_response, recognize=listen.recognize):
+        """
+        Args:
+            source: A source object (MicrophoneSource, WavSource, ...).
+            on_response (callable): Called with (session, query, text, status)
+                for every reply.
+            recognize (callable): Transcribes (audio, recognizer, rescore=...) to text.
+        """
+        self.source = source
+        self.name = source.name
+        self.on_response = on_response
+        self.recognize = recognize
+        self.dialogs = DialogManager()
+        # Each session has its own recognizer so none of them share settings
+        self.recognizer = sr.Recognizer()
+        self.stats = collections.Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"session-{self.name}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    def _reply(self, query, response, status):
+        text = as_text(response)
+        log_command(query, text, status)
+        self.on_response(self, query, text, status)
+
+    def _check_timeout(self):
+        """Ends this session's dialog if its question has gone unanswered too long."""
+        timed_out = self.dialogs.check_timeout()
+        if timed_out:
+            self._reply(None, *timed_out)
+
+    def handle(self, query):
+        """
+        Runs one utterance through the shared command engine.
+
+        Returns:
+            bool: False if the user said goodbye and the session should end.
+        """
+        self.stats["turns"] += 1
+        query_lower = query.lower()
+        if self.dialogs.active:
+            self._reply(query, *self.dialogs.handle(query_lower))
+            return True
+        route = resolve(query_lower, self.dialogs)
+        response, status = run(route)
+        if response:
+            self._reply(query, response, status)
+        return route.name != "goodbye"
+
+    def _run(self):
+        try:
+            frames = self.source.frames()
+            for audio in _utterances(frames, self.source.sample_rate, self.source.sample_width,
+                                     self._stopped, self._check_timeout):
+                self.stats["utterances"] += 1
+                self._check_timeout()
+                # A dialog answer is free text, so keep the recognizer's top guess
+                query = self.recognize(audio, self.recognizer, rescore=not self.dialogs.active)
+                if not query:
+                    self.stats["not_recognized"] += 1
+                    continue
+                if not self.handle(query):
+                    break
+        except Exception as e:
+            print(f"Session {self.name} error: {e}")
+            self.stats["errors"] += 1
+
+class SessionManager:
+    """Starts, tracks and stops the sessions sharing this process."""
+
+    def __init__(self, on_response=_print_response, recognize=listen.recognize):
+        self.on_response = on_response
+        self.recognize = recognize
+        self.sessions = []
+
+    def add(self, source):
+        """Starts a session for a source and returns it."""
+        session = Session(source, self.on_response, self.recognize).start()
+        self.sessions.append(session)
+        return session
+
+    def stop(self):
+        for session in self.sessions:
+            session.stop()
+
+    def wait(self, timeout=None):
+        """Waits until every session has ended, or `timeout` seconds."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for session in self.sessions:
+            session.join(None if deadline is None else max(0, deadline - time.monotonic()))
+
+    def stats(self):
+        return {session.name: dict(session.stats) for session in self.sessions}
+
+# --- Memory benchmark ---
+
+# Offline commands used by the benchmark, so no network services are needed
+_BENCH_QUERIES = [
+    "what time is it", "what's the date", "tell me a joke", "calculate 12 times 7",
+    "add water the plants to my list", "show my list", "hello",
+]
+
+def _peak_memory_mb():
+    """Returns the process's peak resident memory in MB, or None if unavailable."""
+    try:
+        import resource
+    except ImportError:
+        return None  # Not available on Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def _bench_process(count, seconds, latency):
+    """Runs `count` simulated sessions in this process and prints a JSON report."""
+    import commands as cmd
+    # Keep the benchmark's to-do list out of the real one
+    cmd.TODO_FILE = os.path.join(os.getcwd(), "todo.txt")
+    rng = random.Random(0)
+    rng_lock = threading.Lock()
+
+    def fake_recognize(audio, recognizer, rescore=True):
+        # Stands in for the online recognizer, including its round trip
+        time.sleep(latency)
+        with rng_lock:
+            return rng.choice(_BENCH_QUERIES)
+
+    replies = collections.Counter()
+    def count_reply(session, query, text, status):
+        replies[status] += 1
+
+    manager = SessionManager(on_response=count_reply, recognize=fake_recognize)
+    cpu_started = time.process_time()
+    for i in range(count):
+        manager.add(SimulatedSource(f"sim-{i}", seconds, seed=i))
+    manager.wait(seconds + 5)
+    manager.stop()
+    turns = sum(s.stats["turns"] for s in manager.sessions)
+    print(json.dumps({
+        "sources": count,
+        "peak_memory_mb": _peak_memory_mb(),
+        "turns": turns,
+        "replies": dict(replies),
+        "cpu_seconds": round(time.process_time() - cpu_started, 2),
+    }))
+
+def benchmark(counts=(1, 4, 16), seconds=20, latency=0.3):
+    """
+    Measures peak memory for several source counts, each in a fresh process.
+
+    N separate single-source processes would use about N times the memory of
+    the 1-source run, which is reported alongside for comparison.
+
+    Returns:
+        list[dict]: One report per source count.
+    """
+    reports = []
+    single = None
+    for count in counts:
+        # Each run starts clean, in its own directory so its log and to-do
+        # files don't touch the real ones
+        workdir = tempfile.mkdtemp(prefix="assistant-sessions-")
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "bench-process", str(count),
+             "--seconds", str(seconds), "--latency", str(latency)],
+            cwd=workdir, capture_output=True, text=True, check=True,
+        ).stdout
+        report = json.loads(output.strip().splitlines()[-1])
+        if count == 1:
+            single = report["peak_memory_mb"]
+        if single and report["peak_memory_mb"]:
+            report["separate_processes_mb"] = round(single * count, 1)
+            report["saving"] = f"{1 - report['peak_memory_mb'] / (single * count):.0%}"
+        reports.append(report)
+    return reports
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run several assistant sessions in one process.")
+    commands = parser.add_subparsers(dest="mode", required=True)
+    commands.add_parser("devices", help="List the microphones")
+    run_parser = commands.add_parser("run", help="Serve one session per source")
+    run_parser.add_argument("--mic", type=int, action="append", default=[], help="Microphone index")
+    run_parser.add_argument("--wav", action="append", default=[], help="16-bit mono WAV file")
+    run_parser.add_argument("--tcp", type=int, action="append", default=[], help="Port for raw 16 kHz PCM")
+    bench_parser = commands.add_parser("bench", help="Memory benchmark with simulated sources")
+    bench_parser.add_argument("--sources", type=int, nargs="+", default=[1, 4, 16])
+    bench_parser.add_argument("--seconds", type=float, default=20)
+    bench_parser.add_argument("--latency", type=float, default=0.3, help="Simulated recognition time")
+    process_parser = commands.add_parser("bench-process")  # Used internally by "bench"
+    process_parser.add_argument("count", type=int)
+    process_parser.add_argument("--seconds", type=float, default=20)
+    process_parser.add_argument("--latency", type=float, default=0.3)
+    args = parser.parse_args(argv)
+
+    if args.mode == "devices":
+        for index, name in enumerate(sr.Microphone.list_microphone_names()):
+            print(f"{index}: {name}")
+    elif args.mode == "run":
+        sources = ([MicrophoneSource(i) for i in args.mic] + [WavSource(p) for p in args.wav]
+                   + [TcpSource(port) for port in args.tcp])
+        if not sources:
+            parser.error("give at least one --mic, --wav or --tcp source")
+        manager = SessionManager()
+        for source in sources:
+            manager.add(source)
+        try:
+            manager.wait()
+        except KeyboardInterrupt:
+            manager.stop()
+        print(json.dumps(manager.stats(), indent=2))
+    elif args.mode == "bench":
+        print(json.dumps(benchmark(args.sources, args.seconds, args.latency), indent=2))
+    else:
+        _bench_process(args.count, args.seconds, args.latency)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,484 @@
+# ==============================================================================
+# simulator.py
+# ------------------------------------------------------------------------------
+# This module runs local stand-ins for every external service the assistant
+# uses (OpenWeatherMap, NewsAPI, Wikipedia, the Spotify Web API and an SMTP
+# server), so the assistant can be tested and benchmarked offline.
+#
+# Each service has a FaultProfile that controls its response latency (drawn
+# from a configurable distribution), error rate, rate limiting and how often
+# it responds very slowly. Random draws are seeded, so runs are reproducible.
+#
+# The assistant is pointed at the simulator through the ASSISTANT_* environment
+# variables read by config.py.
+#
+# Usage:
+#   python simulator.py serve                     # run the services and print the env variables
+#   python simulator.py bench --requests 200 --concurrency 4 --error-rate 0.05
+# ==============================================================================
+
+import os
+import json
+import time
+import zlib
+import random
+import tempfile
+import argparse
+import threading
+import statistics
+import socketserver
+import collections
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+
+# Supported latency distributions. Each takes (rng, mean, spread) and returns seconds.
+LATENCY_DISTRIBUTIONS = {
+    "fixed": lambda rng, mean, spread: mean,
+    "uniform": lambda rng, mean, spread: rng.uniform(max(0, mean - spread), mean + spread),
+    "normal": lambda rng, mean, spread: max(0, rng.gauss(mean, spread)),
+    "exponential": lambda rng, mean, spread: rng.expovariate(1 / mean) if mean > 0 else 0,
+    # A long-tailed distribution, typical of real network services. `spread` is sigma.
+    "lognormal": lambda rng, mean, spread: rng.lognormvariate(0, spread) * mean,
+}
+
+class FaultProfile:
+    """Latency and fault settings for one simulated service."""
+
+    def __init__(self, latency="fixed", mean=0.05, spread=0.0, error_rate=0.0,
+                 rate_limit=0, burst=5, slow_rate=0.0, slow_seconds=3.0, seed=0):
+        """
+        Args:
+            latency (str): The name of a distribution in LATENCY_DISTRIBUTIONS.
+            mean (float): Typical response latency, in seconds.
+            spread (float): Spread of the distribution (for lognormal, sigma).
+            error_rate (float): Fraction of requests that fail with a server error (0-1).
+            rate_limit (float): Requests per second allowed before returning
+                "too many requests". 0 disables rate limiting.
+            burst (int): How many requests can exceed the rate limit at once.
+            slow_rate (float): Fraction of responses that trickle out slowly (0-1).
+            slow_seconds (float): How long a slow response takes to send.
+            seed (int): Seed for the random draws, for reproducible runs.
+        """
+        if latency not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {latency}")
+        self.latency = latency
+        self.mean = mean
+        self.spread = spread
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.slow_rate = slow_rate
+        self.slow_seconds = slow_seconds
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        # Token bucket for rate limiting
+        self._tokens = burst
+        self._last_refill = time.monotonic()
+        self.stats = collections.Counter()
+
+    @classmethod
+    def from_dict(cls, settings, seed=0):
+        """Builds a profile from a dict of the __init__ arguments."""
+        return cls(**{"seed": seed, **settings})
+
+    def draw(self):
+        """
+        Decides how the next request will be handled.
+
+        Returns:
+            tuple[str, float]: The outcome ("ok", "error", "throttled" or "slow")
+            and the latency to add before responding, in seconds.
+        """
+        with self._lock:
+            self.stats["requests"] += 1
+            if self.rate_limit:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate_limit)
+                self._last_refill = now
+                if self._tokens < 1:
+                    self.stats["throttled"] += 1
+                    return "throttled", 0.0
+                self._tokens -= 1
+
+            delay = LATENCY_DISTRIBUTIONS[self.latency](self._rng, self.mean, self.spread)
+            if self._rng.random() < self.error_rate:
+                outcome = "error"
+            elif self._rng.random() < self.slow_rate:
+                outcome = "slow"
+            else:
+                outcome = "ok"
+            self.stats[outcome] += 1
+            return outcome, delay
+
+# --- Simulated HTTP services ---
+# Each handler takes (method, path, query params) and returns (status, payload).
+
+_CITY_NOT_FOUND = "nowhere"
+
+def _stable_number(text, low, high):
+    """Returns a number derived from `text`, so the same input always gives the same data."""
+    return low + zlib.crc32(text.encode()) % (high - low + 1)
+
+def _weather(method, path, params):
+    city = params.get("q", [""])[0]
+    if not city or city.lower() == _CITY_NOT_FOUND:
+        return 404, {"cod": "404", "message": "city not found"}
+    return 200, {
+        "name": city.title(),
+        "main": {"temp": _stable_number(city, 5, 40)},
+        "weather": [{"description": ["clear sky", "light rain", "scattered clouds"][_stable_number(city, 0, 2)]}],
+    }
+
+def _news(method, path, params):
+    return 200, {
+        "status": "ok",
+        "articles": [{"title": f"Simulated headline number {i + 1}"} for i in range(10)],
+    }
+
+def _wikipedia(method, path, params):
+    """Answers the three MediaWiki API queries made by wikipedia.summary()."""
+    if params.get("list") == ["search"]:
+        query = params.get("srsearch", [""])[0]
+        results = [] if query.lower() == "nothing" else [{"title": query.title()}]
+        return 200, {"query": {"search": results, "searchinfo": {}}}
+    title = params.get("titles", [""])[0]
+    pageid = str(_stable_number(title, 1000, 999999))
+    page = {"pageid": int(pageid), "title": title, "ns": 0}
+    if "extracts" in params.get("prop", [""])[0]:
+        page["extract"] = f"{title} is a simulated article. It exists only for testing."
+    else:
+        page["fullurl"] = f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}"
+    return 200, {"query": {"pages": {pageid: page}}}
+
+def _spotify(method, path, params):
+    """Answers the Spotify Web API endpoints used by commands.py."""
+    def track(name):
+        return {"name": name.title(), "uri": f"spotify:track:{_stable_number(name, 10 ** 6, 10 ** 7)}",
+                "artists": [{"name": "Simulated Artist"}]}
+
+    if path.endswith("/search"):
+        return 200, {"tracks": {"items": [track(params.get("q", ["song"])[0])]}}
+    if path.endswith("/me/player/devices"):
+        return 200, {"devices": [{"id": "simulated-device", "is_active": True, "name": "Simulator"}]}
+    if path.endswith("/me/tracks"):
+        return 200, {"items": [{"track": track(f"saved song {i}")} for i in range(20)], "next": None}
+    if path.endswith("/me/top/tracks"):
+        return 200, {"items": [track(f"top song {i}") for i in range(10)]}
+    if path.rsplit("/", 1)[-1] in ("play", "pause", "next"):
+        return 204, None
+    return 404, {"error": {"status": 404, "message": "Unknown endpoint"}}
+
+def _make_handler(service, profile):
+    """Creates a request handler class that serves `service` with the given faults."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _handle(self):
+            # Drain any request body so the connection can be reused
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+
+            outcome, delay = profile.draw()
+            time.sleep(delay)
+            if outcome == "throttled":
+                status, payload = 429, {"error": {"status": 429, "message": "Rate limit exceeded"}}
+            elif outcome == "error":
+                status, payload = 503, {"error": {"status": 503, "message": "Simulated failure"}}
+            else:
+                url = urlparse(self.path)
+                status, payload = service(self.command, url.path, parse_qs(url.query))
+
+            body = b"" if payload is None else json.dumps(payload).encode()
+            self.send_response(status)
+            if status == 429:
+                self.send_header("Retry-After", "1")
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if outcome == "slow" and body:
+                # Trickle the body out in small pieces over slow_seconds
+                pieces = [body[i:i + 16] for i in range(0, len(body), 16)]
+                for piece in pieces:
+                    self.wfile.write(piece)
+                    self.wfile.flush()
+                    time.sleep(profile.slow_seconds / len(pieces))
+            else:
+                self.wfile.write(body)
+
+        do_GET = do_PUT = do_POST = do_DELETE = _handle
+
+        def log_message(self, format, *args):
+            pass  # Keep the console quiet during benchmarks
+
+    return Handler
+
+# --- Simulated SMTP service ---
+
+def _make_smtp_handler(profile, outbox):
+    """Creates a minimal SMTP handler that accepts any login and stores messages in `outbox`."""
+
+    class Handler(socketserver.StreamRequestHandler):
+
+        def reply(self, line):
+            self.wfile.write(line.encode() + b"\r\n")
+
+        def handle(self):
+            outcome, delay = profile.draw()
+            time.sleep(delay)
+            if outcome == "throttled":
+                self.reply("421 4.7.0 Too many connections, try again later")
+                return
+            self.reply("220 simulator ESMTP ready")
+            message = None
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    return
+                command = line.decode(errors="replace").strip()
+                verb = command.split(" ", 1)[0].upper()
+                if message is not None:
+                    # Collecting the message body until the lone "."
+                    if command == ".":
+                        if outcome == "error":
+                            self.reply("451 4.3.0 Simulated failure")
+                        else:
+                            outbox.append(b"".join(message))
+                            self.reply("250 2.0.0 Message accepted")
+                        message = None
+                    else:
+                        message.append(line)
+                elif verb in ("EHLO", "HELO"):
+                    self.reply("250-simulator")
+                    self.reply("250 AUTH PLAIN LOGIN")
+                elif verb == "AUTH":
+                    self.reply("235 2.7.0 Authentication successful")
+                elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                    self.reply("250 2.1.0 OK")
+                elif verb == "DATA":
+                    message = []
+                    self.reply("354 End data with <CR><LF>.<CR><LF>")
+                elif verb == "QUIT":
+                    self.reply("221 2.0.0 Bye")
+                    return
+                else:
+                    self.reply("502 5.5.2 Command not implemented")
+
+    return Handler
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+# The services and the environment variable that points the assistant at each one
+SERVICES = {
+    "weather": (_weather, "ASSISTANT_WEATHER_API_URL", "/data/2.5/weather"),
+    "news": (_news, "ASSISTANT_NEWS_API_URL", "/v2/top-headlines"),
+    "wikipedia": (_wikipedia, "ASSISTANT_WIKIPEDIA_API_URL", "/w/api.php"),
+    "spotify": (_spotify, "ASSISTANT_SPOTIFY_API_URL", "/v1/"),
+}
+
+class Simulator:
+    """Runs all the simulated services on local ports in background threads."""
+
+    def __init__(self, profiles=None, host="127.0.0.1"):
+        """
+        Args:
+            profiles (dict[str, FaultProfile]): Fault settings keyed by service
+                name ("weather", "news", "wikipedia", "spotify", "smtp").
+                Services without one get a default profile.
+            host (str): The interface to listen on.
+        """
+        profiles = profiles or {}
+        self.profiles = {name: profiles.get(name) or FaultProfile() for name in (*SERVICES, "smtp")}
+        self.host = host
+        self.outbox = []
+        self._servers = {}
+
+    def start(self):
+        """Starts every service on a free port."""
+        for name, (service, _, _) in SERVICES.items():
+            server = ThreadingHTTPServer((self.host, 0), _make_handler(service, self.profiles[name]))
+            server.daemon_threads = True
+            self._servers[name] = server
+        self._servers["smtp"] = _ThreadingTCPServer(
+            (self.host, 0), _make_smtp_handler(self.profiles["smtp"], self.outbox)
+        )
+        for server in self._servers.values():
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        for server in self._servers.values():
+            server.shutdown()
+            server.server_close()
+
+    def environment(self):
+        """Returns the environment variables that point config.py at the simulator."""
+        env = {}
+        for name, (_, variable, path) in SERVICES.items():
+            env[variable] = f"http://{self.host}:{self._servers[name].server_address[1]}{path}"
+        env["ASSISTANT_SPOTIFY_ACCESS_TOKEN"] = "simulated-token"
+        env["ASSISTANT_SMTP_HOST"] = self.host
+        env["ASSISTANT_SMTP_PORT"] = str(self._servers["smtp"].server_address[1])
+        env["ASSISTANT_SMTP_USE_SSL"] = "0"
+        return env
+
+# --- Benchmark ---
+
+_CITIES = ["delhi", "mumbai", "pune", "bhopal", "london", _CITY_NOT_FOUND]
+_TOPICS = ["python programming language", "taj mahal", "machine learning", "nothing"]
+_SONGS = ["blinding lights", "believer", "shape of you", "levitating"]
+
+def _workload(count, seed):
+    """Returns a reproducible list of `count` queries covering every simulated service."""
+    rng = random.Random(seed)
+    templates = [
+        lambda: f"weather in {rng.choice(_CITIES)}",
+        lambda: "tell me the news",
+        lambda: f"wikipedia {rng.choice(_TOPICS)}",
+        lambda: f"play music {rng.choice(_SONGS)}",
+        lambda: "pause music",
+        lambda: "next track",
+        lambda: f"weather in {rng.choice(_CITIES)} and {rng.choice(_CITIES)} and the news",
+        lambda: "send email",
+    ]
+    return [rng.choice(templates)() for _ in range(count)]
+
+def _percentile(values, pct):
+    """Returns the pct-th percentile of a list of numbers (nearest rank)."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+# Responses from commands.py that mean the request did not succeed
+_FAILURE_PREFIXES = ("Sorry", "Could not", "An error", "No active", "I was unable")
+
+def run_benchmark(requests_count=200, concurrency=4, seed=0, profiles=None, use_caches=False):
+    """
+    Runs a reproducible workload through the assistant's dispatcher against the simulator.
+
+    Args:
+        requests_count (int): How many queries to run.
+        concurrency (int): How many queries run at the same time.
+        seed (int): Seed for the workload and the fault profiles.
+        profiles (dict[str, FaultProfile]): Fault settings per service.
+        use_caches (bool): If False, the response and song caches are disabled
+            so that every query reaches the simulated services.
+
+    Returns:
+        dict: Latency percentiles and outcome counts per command, plus totals.
+    """
+    simulator = Simulator(profiles).start()
+    # config.py reads these at import time, so set them before importing the assistant
+    os.environ.update(simulator.environment())
+    workdir = tempfile.mkdtemp(prefix="assistant-bench-")
+    import commands as cmd
+    import song_cache
+    from dispatcher import resolve, run, as_text
+
+    # Use placeholder credentials and keep benchmark files out of the real ones
+    cmd.WEATHER_API_KEY = cmd.NEWS_API_KEY = "simulated-key"
+    song_cache.SONG_CACHE_FILE = os.path.join(workdir, "song_cache.json")
+    if not use_caches:
+        cmd.RESPONSE_CACHE_SECONDS = 0
+        song_cache.SONG_CACHE_SIZE = 0
+    account = {"address": "bench@example.com", "password": "simulated"}
+
+    def one(query):
+        started = time.perf_counter()
+        try:
+            if query == "send email":
+                # The email dialog needs a conversation, so send directly
+                name, response = "send_email", cmd.send_email(account, "to@example.com", "Benchmark", "Hello")
+            else:
+                route = resolve(query, None)
+                name, response = route.name, as_text(run(route)[0])
+            outcome = "failed" if response.startswith(_FAILURE_PREFIXES) else "ok"
+        except Exception:
+            name, outcome = ("send_email" if query == "send email" else resolve(query, None).name), "crashed"
+        return name, outcome, time.perf_counter() - started
+
+    workload = _workload(requests_count, seed)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, workload))
+    elapsed = time.perf_counter() - started
+    simulator.stop()
+
+    report = {"requests": requests_count, "concurrency": concurrency, "seed": seed,
+              "elapsed_seconds": round(elapsed, 3),
+              "throughput_per_second": round(requests_count / elapsed, 2), "commands": {}}
+    by_command = collections.defaultdict(list)
+    for name, outcome, latency in results:
+        by_command[name].append((outcome, latency))
+    for name, rows in sorted(by_command.items()):
+        latencies = [latency for _, latency in rows]
+        report["commands"][name] = {
+            "count": len(rows),
+            **collections.Counter(outcome for outcome, _ in rows),
+            "p50_ms": round(_percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(_percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(_percentile(latencies, 99) * 1000, 1),
+            "max_ms": round(max(latencies) * 1000, 1),
+            "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+        }
+    report["services"] = {name: dict(profile.stats) for name, profile in simulator.profiles.items()}
+    return report
+
+def _profiles_from_args(args):
+    """Builds the per-service fault profiles from the command-line options."""
+    base = {
+        "latency": args.latency, "mean": args.mean, "spread": args.spread,
+        "error_rate": args.error_rate, "rate_limit": args.rate_limit,
+        "slow_rate": args.slow_rate, "slow_seconds": args.slow_seconds,
+    }
+    overrides = {}
+    if args.profiles:
+        with open(args.profiles, "r") as f:
+            overrides = json.load(f)
+    return {
+        name: FaultProfile.from_dict({**base, **overrides.get(name, {})}, seed=args.seed + i)
+        for i, name in enumerate((*SERVICES, "smtp"))
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local simulator for the assistant's external services.")
+    parser.add_argument("mode", choices=("serve", "bench"))
+    parser.add_argument("--requests", type=int, default=200, help="Number of queries to run (bench)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Queries run at the same time (bench)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", choices=sorted(LATENCY_DISTRIBUTIONS), default="lognormal")
+    parser.add_argument("--mean", type=float, default=0.05, help="Typical latency in seconds")
+    parser.add_argument("--spread", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0, help="Requests per second, 0 for none")
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-seconds", type=float, default=3.0)
+    parser.add_argument("--profiles", help="JSON file with per-service overrides, keyed by service name")
+    parser.add_argument("--use-caches", action="store_true", help="Keep the assistant's caches on (bench)")
+    parser.add_argument("--output", help="Write the benchmark report to this JSON file (bench)")
+    args = parser.parse_args(argv)
+    profiles = _profiles_from_args(args)
+
+    if args.mode == "serve":
+        simulator = Simulator(profiles).start()
+        print("Simulator running. Point the assistant at it with:")
+        for variable, value in simulator.environment().items():
+            print(f"  {variable}={value}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            simulator.stop()
+        return
+
+    report = run_benchmark(args.requests, args.concurrency, args.seed, profiles, args.use_caches)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# ==============================================================================
+# song_cache.py
+# ------------------------------------------------------------------------------
+# This module remembers which Spotify track a spoken song name refers to, so
+# that songs the user plays often can be started without a search request.
+# It has two parts, both saved to a JSON file between sessions:
+#   - A least-recently-used cache of song names that have been played
+#     successfully, limited to SONG_CACHE_SIZE entries.
+#   - An optional index of the user's saved and top tracks, fetched ahead of
+#     time, so even a first request for a favourite song needs no search.
+# ==============================================================================
+
+import re
+import json
+import time
+import threading
+import collections
+
+from config import SONG_CACHE_FILE, SONG_CACHE_SIZE, SONG_INDEX_MAX_AGE
+
+_lock = threading.Lock()
+# Normalized song name -> track URI, most recently used last
+_recent = collections.OrderedDict()
+# Normalized track name (and "name by artist") -> track URI from the user's library
+_index = {}
+# When the library index was last fetched (time.time()), or 0 if never
+_index_updated = 0
+_loaded = False
+
+def normalize(song_name):
+    """
+    Normalizes a spoken song name so that small differences don't matter.
+
+    "Play Blinding Lights!" and "blinding  lights" both become "blinding lights".
+    """
+    words = re.sub(r"[^\w\s]", " ", song_name.lower()).split()
+    return " ".join(words)
+
+def _load():
+    """Loads the cache file on first use. Must be called with the lock held."""
+    global _loaded, _index_updated
+    if _loaded:
+        return
+    _loaded = True
+    try:
+        with open(SONG_CACHE_FILE, "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return
+    _recent.update(data.get("recent", []))
+    _index.update(data.get("index", {}))
+    _index_updated = data.get("index_updated", 0)
+
+def _save():
+    """Writes the cache file. Must be called with the lock held."""
+    data = {"recent": list(_recent.items()), "index": _index, "index_updated": _index_updated}
+    try:
+        with open(SONG_CACHE_FILE, "w") as f:
+            json.dump(data, f)
+    except OSError as e:
+        print(f"Song cache error: {e}")
+
+def lookup(song_name):
+    """
+    Finds the track URI for a spoken song name without contacting Spotify.
+
+    Returns:
+        str or None: The track URI, or None if the song is not known.
+    """
+    key = normalize(song_name)
+    with _lock:
+        _load()
+        if key in _recent:
+            _recent.move_to_end(key)
+            return _recent[key]
+        return _index.get(key)
+
+def remember(song_name, track_uri):
+    """Records a successful play, evicting the least recently used entry if full."""
+    key = normalize(song_name)
+    with _lock:
+        _load()
+        _recent[key] = track_uri
+        _recent.move_to_end(key)
+        while len(_recent) > SONG_CACHE_SIZE:
+            _recent.popitem(last=False)
+        _save()
+
+def index_is_stale():
+    """Returns True if the library index is older than SONG_INDEX_MAX_AGE."""
+    with _lock:
+        _load()
+        return time.time() - _index_updated > SONG_INDEX_MAX_AGE
+
+def prefetch_library(sp, limit=200):
+    """
+    Builds the local index from the user's saved tracks and top tracks.
+
+    Requires the "user-library-read" and "user-top-read" Spotify scopes.
+
+    Args:
+        sp (spotipy.Spotify): An authenticated Spotify client.
+        limit (int): The maximum number of saved tracks to fetch.
+
+    Returns:
+        int: The number of tracks in the index.
+    """
+    global _index_updated
+    tracks = []
+    # Saved tracks come back 50 at a time
+    for offset in range(0, limit, 50):
+        page = sp.current_user_saved_tracks(limit=50, offset=offset)
+        tracks.extend(item["track"] for item in page["items"])
+        if not page.get("next"):
+            break
+    tracks.extend(sp.current_user_top_tracks(limit=50)["items"])
+
+    index = {}
+    for track in tracks:
+        name = normalize(track["name"])
+        index.setdefault(name, track["uri"])
+        for artist in track.get("artists", []):
+            index.setdefault(f"{name} by {normalize(artist['name'])}", track["uri"])
+
+    with _lock:
+        _load()
+        _index.clear()
+        _index.update(index)
+        _index_updated = time.time()
+        _save()
+    return len(index)
@@ -4,30 +4,24 @@
 # This module is responsible for the Text-to-Speech (TTS) functionality of
 # the assistant. It initializes the TTS engine and provides a simple function
 # to convert a given text string into audible speech.
+#
+# A response can also be a stream of sentences (any iterable of strings, such
+# as a generator returned by a command). Playback of the first sentence starts
+# as soon as it is produced, while later sentences are still being produced.
 # ==============================================================================
 
+import queue
+import threading
 import pyttsx3
 
-def speak(audio):
-    """
-    Initializes the TTS engine, speaks the given text, and prints it to the console.
-
-    This function is designed to be self-contained. It initializes the pyttsx3
-    engine on each call to ensure statelessness and avoid potential engine
-    conflicts, especially in a multi-threaded environment.
-
-    Args:
-        audio (str): The text string that the assistant should speak.
-    """
+def _init_engine():
+    """Initializes the pyttsx3 engine and selects the assistant's voice."""
     # Initialize the pyttsx3 engine
     engine = pyttsx3.init()
     
     # Get the list of available voices
     voices = engine.getProperty('voices')
     
-    # Print the assistant's response to the console for a visual log
-    print(f"Assistant: {audio}")
-    
     # Set the voice. voices[0] is typically male, voices[1] is female (can vary by system)
     # The current code has a hardcoded value of voices[2], which may not exist on all systems.
     # It's safer to check the length of the voices list first.
@@ -35,10 +29,86 @@ def speak(audio):
         engine.setProperty('voice', voices[1].id) # Defaulting to a female voice if available
     else:
         engine.setProperty('voice', voices[0].id) # Fallback to the first available voice
-    
-    # Queue the audio text to be spoken
-    engine.say(audio)
-    
-    # Process the voice command queue and wait for it to complete
-    engine.runAndWait()
+    return engine
+
+def _produce(chunks, chunk_queue):
+    """Pulls chunks from a response stream into a queue. Runs on its own thread."""
+    try:
+        for chunk in chunks:
+            if chunk:
+                chunk_queue.put(chunk)
+    except Exception as e:
+        print(f"Error while producing the response: {e}")
+    finally:
+        # Marks the end of the stream
+        chunk_queue.put(None)
+
+def speak(audio, interrupt=None, playing=None):
+    """
+    Initializes the TTS engine, speaks the given text, and prints it to the console.
+
+    This function is designed to be self-contained. It initializes the pyttsx3
+    engine on each call to ensure statelessness and avoid potential engine
+    conflicts, especially in a multi-threaded environment.
+
+    Args:
+        audio (str or iterable[str]): The text the assistant should speak, or a
+            stream of sentences. A stream is consumed on a background thread,
+            and each sentence is spoken as soon as it is available.
+        interrupt (threading.Event): Optional. If it is set while speaking,
+            playback stops at the next word.
+        playing (threading.Event): Optional. Set while an utterance is being
+            played, so a listener can tell the assistant's own voice (picked
+            up by the microphone) from the user's.
+
+    Returns:
+        bool: True if playback was interrupted, otherwise False.
+    """
+    engine = _init_engine()
+
+    # pyttsx3 can only be stopped safely from one of its own callbacks, so
+    # check the interrupt flag at the start of every word
+    interrupted = False
+    def on_word(name, location, length):
+        nonlocal interrupted
+        if interrupt is not None and interrupt.is_set() and not interrupted:
+            interrupted = True
+            engine.stop()
+    tokens = [engine.connect('started-word', on_word)]
+    if playing is not None:
+        tokens.append(engine.connect('started-utterance', lambda name: playing.set()))
+        tokens.append(engine.connect('finished-utterance', lambda name, completed: playing.clear()))
+
+    try:
+        if isinstance(audio, str):
+            # Print the assistant's response to the console for a visual log
+            print(f"Assistant: {audio}")
+            # Queue the audio text to be spoken
+            engine.say(audio)
+            # Process the voice command queue and wait for it to complete
+            engine.runAndWait()
+            return interrupted
 
+        chunk_queue = queue.Queue()
+        threading.Thread(target=_produce, args=(audio, chunk_queue), daemon=True).start()
+        while not interrupted:
+            # Wait for the next sentence, then also take any others that are
+            # already waiting so they are spoken without a gap between them
+            chunks = [chunk_queue.get()]
+            while chunks[-1] is not None and not chunk_queue.empty():
+                chunks.append(chunk_queue.get())
+            finished = chunks[-1] is None
+            for chunk in filter(None, chunks):
+                print(f"Assistant: {chunk}")
+                engine.say(chunk)
+            if len(chunks) > 1 or not finished:
+                engine.runAndWait()
+            if finished:
+                break
+        return interrupted
+    finally:
+        # pyttsx3.init() can hand back the same engine next time, so don't leave the callbacks behind
+        for token in tokens:
+            engine.disconnect(token)
+        if playing is not None:
+            playing.clear()
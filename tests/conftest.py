@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# The assistant's modules live at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The modules write their log, index and profile files to the working
+# directory, so keep test runs from leaving them in the checkout
+os.chdir(tempfile.mkdtemp(prefix="assistant-tests-"))
@@ -0,0 +1,94 @@
+import threading
+
+import numpy as np
+
+import bargein
+from bargein import BargeInMonitor, VoiceActivityDetector, rms
+
+CHUNK = 1024
+AMBIENT = 100
+ECHO_LEVELS = (800, 2500, 1500, 400, 2200)  # The assistant's voice rising and falling with each word
+USER = 12000
+
+def frame(energy):
+    """A 16-bit frame whose RMS energy is exactly `energy`."""
+    samples = np.full(CHUNK, energy, dtype="<i2")
+    samples[1::2] *= -1
+    return samples.tobytes()
+
+def echo(count):
+    return [frame(ECHO_LEVELS[i % len(ECHO_LEVELS)]) for i in range(count)]
+
+def playback(playing, ambient, during, after=()):
+    """Ambient frames, then frames captured while the assistant is speaking."""
+    for data in ambient:
+        yield data
+    playing.set()
+    for data in during:
+        yield data
+    playing.clear()
+    for data in after:
+        yield data
+
+def run_monitor(frames, playing):
+    monitor = BargeInMonitor(frames, playing=playing)
+    monitor.start()
+    monitor.join(5)
+    return monitor
+
+def test_rms_matches_sample_scale():
+    assert rms(frame(1234), 2) == 1234
+    assert rms(np.full(10, -70000, dtype="<i4").tobytes(), 4) == 70000
+    assert rms(b"", 2) == 0
+
+def test_assistant_echo_does_not_trigger():
+    playing = threading.Event()
+    monitor = run_monitor(playback(playing, [frame(AMBIENT)] * 5, echo(200)), playing)
+    assert not monitor.triggered.is_set()
+    assert monitor.audio is None
+
+def test_echo_counts_as_speech_without_playback_reference():
+    # Without the playback reference the echo is many times the ambient floor
+    vad = VoiceActivityDetector()
+    vad.update(frame(AMBIENT), 2)
+    assert any(vad.update(data, 2) for data in echo(20))
+
+def test_user_interrupting_triggers_and_is_recorded():
+    playing = threading.Event()
+    during = echo(30) + [frame(USER + 2000)] * 10 + echo(3)
+    after = [frame(AMBIENT)] * 40
+    monitor = run_monitor(playback(playing, [frame(AMBIENT)] * 5, during, after), playing)
+    assert monitor.triggered.is_set()
+    samples = np.frombuffer(monitor.audio.frame_data, dtype="<i2")
+    # The whole interruption is in the recording, along with the pre-roll
+    assert (np.abs(samples) == USER + 2000).sum() == 10 * CHUNK
+
+def interrupt_speech(monkeypatch, said):
+    """Runs speak_with_barge_in() with the user saying `said` over the response."""
+    started = threading.Event()
+    spoken = {}
+
+    def fake_speak(text, interrupt=None, playing=None):
+        playing.set()
+        started.set()
+        spoken["interrupted"] = interrupt.wait(5)
+        playing.clear()
+        return spoken["interrupted"]
+
+    def frames():
+        yield from [frame(AMBIENT)] * 5
+        started.wait(5)
+        yield from echo(20) + [frame(USER)] * 10 + [frame(AMBIENT)] * 40
+
+    monkeypatch.setattr(bargein, "speak", fake_speak)
+    monkeypatch.setattr(bargein, "recognize", lambda audio, rescore=True: said)
+    return bargein.speak_with_barge_in("A long answer", frames=frames()), spoken["interrupted"]
+
+def test_speak_with_barge_in_stops_for_the_user(monkeypatch):
+    assert interrupt_speech(monkeypatch, "what's the weather") == ("what's the weather", True)
+
+def test_stop_only_stops_the_speech(monkeypatch):
+    # A bare "stop" is not passed on, so it isn't routed to pause_music
+    assert interrupt_speech(monkeypatch, "stop") == (None, True)
+    assert interrupt_speech(monkeypatch, "Okay stop talking please") == (None, True)
+    assert interrupt_speech(monkeypatch, "stop the music") == ("stop the music", True)
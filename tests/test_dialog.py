@@ -0,0 +1,59 @@
+import pytest
+
+import dialog
+import executor
+from dialog import DialogManager, EmailDialog, is_cancel, parse_yes_no
+
+@pytest.mark.parametrize("answer", [
+    "i'm not sure", "that's not correct", "no that is not correct", "no", "nope thanks",
+    "don't do it", "never",
+])
+def test_negative_answers(answer):
+    assert parse_yes_no(answer) is False
+
+@pytest.mark.parametrize("answer", ["yes", "yeah go ahead", "sure", "that's correct", "yes please"])
+def test_affirmative_answers(answer):
+    assert parse_yes_no(answer) is True
+
+@pytest.mark.parametrize("answer", ["i don't know", "no idea", "maybe later", "yes no"])
+def test_unclear_answers(answer):
+    assert parse_yes_no(answer) is None
+
+@pytest.mark.parametrize("answer", [
+    "cancel", "please cancel", "stop it", "oh never mind", "cancel the email", "stop the shutdown",
+    "cancel email",
+])
+def test_cancel_answers(answer):
+    assert is_cancel(answer)
+
+@pytest.mark.parametrize("answer", ["please stop by my office", "cancel the meeting on friday", "stop by at noon"])
+def test_free_text_is_not_a_cancel(answer):
+    assert not is_cancel(answer)
+
+def _email_dialog(manager):
+    account = next(iter(dialog.EMAIL_ACCOUNTS))
+    recipient = next(iter(dialog.CONTACTS))
+    manager.start(EmailDialog(), f"send email from {account} to {recipient}")
+    manager.handle("lunch")
+    manager.handle("see you at noon")
+
+def test_cancel_the_email_ends_the_dialog():
+    manager = DialogManager()
+    account = next(iter(dialog.EMAIL_ACCOUNTS))
+    manager.start(EmailDialog(), f"send email from {account}")
+    assert manager.handle("cancel the email") == ("Okay, email cancelled.", "Dialog Cancelled")
+    assert manager.active is None
+
+def test_not_correct_does_not_send(monkeypatch):
+    sent = []
+    monkeypatch.setattr(executor, "call", lambda *args: sent.append(args) or ("Email sent.", None))
+    manager = DialogManager()
+    _email_dialog(manager)
+    assert manager.handle("no, that is not correct") == ("Okay, email cancelled.", "Command Handled")
+    assert sent == []
+
+def test_failed_send_keeps_its_status(monkeypatch):
+    monkeypatch.setattr(executor, "call", lambda *args: ("Sorry, send email is taking too long.", "Timed Out"))
+    manager = DialogManager()
+    _email_dialog(manager)
+    assert manager.handle("yes") == ("Sorry, send email is taking too long.", "Timed Out")
@@ -0,0 +1,30 @@
+from dispatcher import COMPOUND, resolve
+
+def _parts(route):
+    """The (name, args) of each command in a resolved route."""
+    routes = route.call.args[0] if route.name == COMPOUND else [route]
+    return [(part.name, part.call.args) for part in routes]
+
+def test_search_argument_is_not_split():
+    assert _parts(resolve("search for date and time", {})) == [("search_web", ("date and time",))]
+
+def test_wikipedia_argument_keeps_the_rest_of_the_query():
+    assert _parts(resolve("wikipedia taj mahal and the news", {})) == [
+        ("search_wikipedia", ("taj mahal and the news",)),
+    ]
+
+def test_free_text_part_is_never_replaced_by_a_keyword_in_its_argument():
+    assert _parts(resolve("weather in delhi and wikipedia python and the news", {})) == [
+        ("get_weather", ("delhi",)),
+        ("search_wikipedia", ("python and the news",)),
+    ]
+
+def test_screenshot_format_aliases():
+    assert _parts(resolve("take a screenshot as jpg", {})) == [("take_screenshot", ("jpg",))]
+    assert _parts(resolve("take a jpeg screenshot", {})) == [("take_screenshot", ("jpeg",))]
+    assert _parts(resolve("take a screenshot", {})) == [("take_screenshot", (None,))]
+
+def test_compound_query_is_still_split():
+    assert _parts(resolve("weather in delhi and mumbai and the news", {})) == [
+        ("get_weather", ("delhi",)), ("get_weather", ("mumbai",)), ("get_news", ()),
+    ]
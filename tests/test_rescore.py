@@ -0,0 +1,16 @@
+from rescore import best_transcript
+
+def test_confident_unlisted_city_is_kept():
+    alternatives = [{"transcript": "weather in paris", "confidence": 0.9}, {"transcript": "weather in pune"}]
+    assert best_transcript(alternatives) == "weather in paris"
+
+def test_listed_city_breaks_a_near_tie():
+    alternatives = [
+        {"transcript": "weather in purne", "confidence": 0.62},
+        {"transcript": "weather in pune", "confidence": 0.6},
+    ]
+    assert best_transcript(alternatives) == "weather in pune"
+
+def test_command_beats_a_more_confident_non_command():
+    alternatives = [{"transcript": "whether in pune", "confidence": 0.9}, {"transcript": "weather in pune"}]
+    assert best_transcript(alternatives) == "weather in pune"
@@ -0,0 +1,51 @@
+import os
+import threading
+
+from PIL import Image
+
+import screenshot
+
+class FakeScreen:
+    """A synthetic image source whose grabs can be made to fail."""
+
+    def __init__(self, fail_on=()):
+        self.fail_on = set(fail_on)
+        self.grabs = 0
+
+    def __call__(self):
+        self.grabs += 1
+        if self.grabs in self.fail_on:
+            raise OSError("display unavailable")
+        return Image.new("RGBA", (64, 48), (self.grabs * 40 % 256, 0, 0, 255))
+
+def test_burst_writes_every_frame_in_order(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    errors = []
+    filenames, thread = screenshot.capture_burst(4, 0.01, "jpeg", grab=FakeScreen(), on_error=errors.append)
+    thread.join(5)
+    assert [name[-7:] for name in filenames] == ["001.jpg", "002.jpg", "003.jpg", "004.jpg"]
+    assert all(os.path.getsize(name) > 0 for name in filenames)
+    # The JPEG encoder can't store alpha, so the frames were converted
+    assert Image.open(filenames[0]).mode == "RGB"
+    assert errors == []
+
+def test_burst_reports_a_failed_grab_and_keeps_going(tmp_path, monkeypatch, caplog):
+    monkeypatch.chdir(tmp_path)
+    errors = []
+    filenames, thread = screenshot.capture_burst(4, 0.01, grab=FakeScreen(fail_on={2}), on_error=errors.append)
+    thread.join(5)
+    assert [os.path.exists(name) for name in filenames] == [True, False, True, True]
+    assert errors == ["Sorry, 1 of 4 screenshots couldn't be saved."]
+    assert f"Screenshot {filenames[1]} failed: display unavailable" in caplog.text
+
+def test_single_capture_reports_failure(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    errors = []
+    reported = threading.Event()
+    def on_error(message):
+        errors.append(message)
+        reported.set()
+    filename, future = screenshot.capture(grab=FakeScreen(fail_on={1}), on_error=on_error)
+    assert reported.wait(5)
+    assert errors == [f"Sorry, the screenshot {filename} couldn't be saved."]
+    assert not os.path.exists(filename)
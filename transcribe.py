@@ -0,0 +1,212 @@
+# ==============================================================================
+# transcribe.py
+# ------------------------------------------------------------------------------
+# This module transcribes a directory of recorded commands (WAV or FLAC) through
+# the same recognizer that listen() uses, so recognition can be tuned against
+# hundreds of recordings instead of live speech.
+#
+# Files are transcribed in parallel and one JSON line per file is written as
+# soon as it finishes, with its timing. If a recording has a sidecar text file
+# with the same name (e.g. "weather.wav" and "weather.txt"), that is taken as
+# the expected transcript and the word error rate is reported.
+#
+# Usage:
+#   python transcribe.py recordings/ --jobs 8 --output results.jsonl --dispatch
+# ==============================================================================
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+import speech_recognition as sr
+
+import listen
+from config import RECOGNIZER_BACKEND, RECOGNIZER_LANGUAGE
+
+AUDIO_EXTENSIONS = (".wav", ".flac")
+
+# Each worker thread gets its own recognizer, so none of them share state
+_local = threading.local()
+
+def find_recordings(directory):
+    """Returns the WAV and FLAC files under a directory, sorted by path."""
+    paths = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(AUDIO_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+def read_expected(path):
+    """Returns the transcript in the recording's sidecar .txt file, or None."""
+    try:
+        with open(os.path.splitext(path)[0] + ".txt", "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def word_error_rate(expected, actual):
+    """
+    Computes the word error rate of a transcript.
+
+    Returns:
+        float: (substitutions + deletions + insertions) / number of expected words.
+    """
+    reference = expected.lower().split()
+    hypothesis = (actual or "").lower().split()
+    if not reference:
+        return 0.0 if not hypothesis else 1.0
+    # Edit distance over words, one row at a time
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(
+                previous[j] + 1,                             # Deletion
+                current[j - 1] + 1,                          # Insertion
+                previous[j - 1] + (ref_word != hyp_word),    # Substitution
+            ))
+        previous = current
+    return previous[-1] / len(reference)
+
+def transcribe_file(path, backend=RECOGNIZER_BACKEND, language=RECOGNIZER_LANGUAGE):
+    """
+    Transcribes one recording.
+
+    This runs in a worker thread or process, so it only uses listen and
+    speech_recognition. Any error, including a backend that isn't installed,
+    is recorded in the result rather than raised, so one bad file never stops
+    a batch.
+
+    Returns:
+        dict: The file, transcript (or error), audio length and timings in seconds.
+    """
+    result = {"file": path, "transcript": None, "error": None}
+    recognizer = getattr(_local, "recognizer", None)
+    if recognizer is None:
+        recognizer = _local.recognizer = sr.Recognizer()
+
+    started = time.perf_counter()
+    try:
+        with sr.AudioFile(path) as source:
+            audio = recognizer.record(source)
+    except Exception as e:
+        result["error"] = f"unreadable: {e}"
+        return result
+    loaded = time.perf_counter()
+    result["audio_seconds"] = round(len(audio.frame_data) / (audio.sample_rate * audio.sample_width), 3)
+    result["load_seconds"] = round(loaded - started, 4)
+
+    try:
+        result["transcript"] = listen.transcribe(audio, recognizer, backend, language).lower()
+    except sr.UnknownValueError:
+        result["error"] = "not recognized"
+    except sr.RequestError as e:
+        result["error"] = f"request failed: {e}"
+    except Exception as e:
+        # e.g. a missing offline backend, or audio the backend can't decode
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["recognize_seconds"] = round(time.perf_counter() - loaded, 4)
+    return result
+
+def _summarize(results, wall_seconds):
+    """Builds the summary printed at the end of a run."""
+    transcribed = [r for r in results if r["transcript"] is not None]
+    audio_seconds = sum(r.get("audio_seconds", 0) for r in results)
+    summary = {
+        "files": len(results),
+        "transcribed": len(transcribed),
+        "errors": len(results) - len(transcribed),
+        "wall_seconds": round(wall_seconds, 2),
+        "files_per_second": round(len(results) / wall_seconds, 2) if wall_seconds else None,
+        "audio_seconds_per_second": round(audio_seconds / wall_seconds, 2) if wall_seconds else None,
+    }
+    if transcribed:
+        latencies = sorted(r["recognize_seconds"] for r in transcribed)
+        summary["recognize_seconds_p50"] = latencies[len(latencies) // 2]
+        summary["recognize_seconds_p95"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+    scored = [r for r in results if "wer" in r]
+    if scored:
+        summary["mean_wer"] = round(sum(r["wer"] for r in scored) / len(scored), 4)
+        summary["exact_matches"] = sum(r["wer"] == 0 for r in scored)
+    routed = [r for r in results if "route" in r]
+    if routed:
+        from dispatcher import NOT_UNDERSTOOD
+        summary["not_understood"] = sum(r["route"] == NOT_UNDERSTOOD for r in routed)
+    return summary
+
+def run(directory, jobs=4, use_processes=False, dispatch=False, output=None,
+        backend=RECOGNIZER_BACKEND, language=RECOGNIZER_LANGUAGE):
+    """
+    Transcribes every recording in a directory.
+
+    Args:
+        directory (str): Folder searched recursively for .wav and .flac files.
+        jobs (int): Number of files transcribed at the same time.
+        use_processes (bool): Use worker processes instead of threads. Threads
+            suit the online backend; processes suit CPU-bound offline backends.
+        dispatch (bool): Also resolve each transcript to a command name. The
+            command is not run.
+        output (file): Where JSON lines are written. Defaults to stdout.
+
+    Returns:
+        dict: The summary of the run.
+    """
+    output = output or sys.stdout
+    paths = find_recordings(directory)
+    if dispatch:
+        from dispatcher import resolve
+
+    pool_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    results = []
+    started = time.perf_counter()
+    with pool_class(max_workers=jobs) as pool:
+        futures = {pool.submit(transcribe_file, path, backend, language): path for path in paths}
+        # Results are written in the order they finish
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker itself failed (e.g. a worker process died), so record the file as failed
+                result = {"file": futures[future], "transcript": None, "error": f"{type(e).__name__}: {e}"}
+            expected = read_expected(result["file"])
+            if expected is not None:
+                result["expected"] = expected
+                result["wer"] = round(word_error_rate(expected, result["transcript"]), 4)
+            if dispatch and result["transcript"]:
+                result["route"] = resolve(result["transcript"], None).name
+            results.append(result)
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+
+    return _summarize(results, time.perf_counter() - started)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe a directory of recorded commands.")
+    parser.add_argument("directory")
+    parser.add_argument("--jobs", type=int, default=4, help="Files transcribed at the same time")
+    parser.add_argument("--processes", action="store_true", help="Use worker processes instead of threads")
+    parser.add_argument("--dispatch", action="store_true", help="Resolve each transcript to a command")
+    parser.add_argument("--backend", choices=sorted(listen.BACKENDS), default=RECOGNIZER_BACKEND)
+    parser.add_argument("--language", default=RECOGNIZER_LANGUAGE)
+    parser.add_argument("--output", help="Write the JSON lines to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"{args.directory} is not a directory")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            summary = run(args.directory, args.jobs, args.processes, args.dispatch, f, args.backend, args.language)
+    else:
+        summary = run(args.directory, args.jobs, args.processes, args.dispatch, None, args.backend, args.language)
+    # The summary goes to stderr so stdout stays valid JSON lines
+    print(json.dumps(summary, indent=2), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
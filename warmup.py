@@ -0,0 +1,228 @@
+# ==============================================================================
+# warmup.py
+# ------------------------------------------------------------------------------
+# This module pre-warms the assistant at startup based on how it has been used
+# before. It reads the query history in the assistant log into a compact usage
+# profile (which commands are used at which time of day, the most requested
+# cities and songs), saves it, and updates it incrementally on later runs.
+# It then calibrates the microphone (once the greeting has finished, so the
+# assistant's own voice isn't taken for background noise) and warms the
+# clients and caches that are most likely to be needed soon, all in the
+# background and within a fixed time budget, so the first listen is never delayed.
+# ==============================================================================
+
+import os
+import json
+import time
+import logging
+import datetime
+import threading
+import collections
+
+import commands as cmd
+import listen
+from dispatcher import resolve, NOT_UNDERSTOOD, COMPOUND
+from logger import LOG_FILE, QUERY_LINE
+from config import WARMUP_TIME_BUDGET, WARMUP_LOG_TAIL_BYTES, WARMUP_PROFILE_FILE
+
+# Commands that use the Spotify client
+_MUSIC_COMMANDS = ("play_song", "pause_music", "next_track")
+
+# How many of the top cities and songs are kept in the saved profile
+_PROFILE_TOP_N = 20
+
+def _empty_profile():
+    """Returns a profile with no history."""
+    return {"log_offset": 0, "by_hour": {}, "cities": {}, "songs": {}}
+
+def _load_profile(profile_file):
+    """Loads the saved profile, or returns an empty one if there is none."""
+    try:
+        with open(profile_file, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return _empty_profile()
+
+def _save_profile(profile, profile_file):
+    """Saves the profile, keeping only the top cities and songs so it stays small."""
+    for key in ("cities", "songs"):
+        top = collections.Counter(profile[key]).most_common(_PROFILE_TOP_N)
+        profile[key] = dict(top)
+    with open(profile_file, "w") as f:
+        json.dump(profile, f)
+
+def _count_route(profile, hour, route):
+    """Adds one use of a command at the given hour to the profile."""
+    if route.name in (NOT_UNDERSTOOD, "goodbye"):
+        return
+    counts = profile["by_hour"].setdefault(hour, {})
+    counts[route.name] = counts.get(route.name, 0) + 1
+
+    # Remember the parameter for commands whose results can be pre-fetched
+    if route.name == "get_weather" and getattr(route.call, "args", None):
+        city = route.call.args[0]
+        profile["cities"][city] = profile["cities"].get(city, 0) + 1
+    elif route.name == "play_song" and getattr(route.call, "args", None):
+        song = route.call.args[0]
+        profile["songs"][song] = profile["songs"].get(song, 0) + 1
+
+def build_profile(log_file=LOG_FILE, profile_file=WARMUP_PROFILE_FILE, deadline=None):
+    """
+    Updates the usage profile with any log lines written since it was last saved.
+
+    Only the part of the log after the saved offset is read. On the first run
+    (or if the log was replaced), only the newest WARMUP_LOG_TAIL_BYTES are read.
+
+    Args:
+        log_file (str): The assistant log file.
+        profile_file (str): Where the profile is saved between runs.
+        deadline (float): A time.monotonic() value. Parsing stops early if reached.
+
+    Returns:
+        dict: The profile, with "by_hour" mapping an hour ("0"-"23") to command
+        counts, and "cities"/"songs" mapping names to request counts.
+    """
+    profile = _load_profile(profile_file)
+    if not os.path.exists(log_file):
+        return profile
+
+    size = os.path.getsize(log_file)
+    if profile["log_offset"] > size:
+        # The log has been truncated or replaced, so start again
+        profile = _empty_profile()
+    start = max(profile["log_offset"], size - WARMUP_LOG_TAIL_BYTES)
+
+    with open(log_file, "rb") as f:
+        f.seek(start)
+        if start > profile["log_offset"]:
+            f.readline()  # Skip the partial line we landed in the middle of
+        for raw_line in f:
+            if deadline is not None and time.monotonic() > deadline:
+                break
+            profile["log_offset"] = f.tell()
+            match = QUERY_LINE.match(raw_line.rstrip(b"\n"))
+            if not match:
+                continue
+            query = match.group(3).decode("utf-8", errors="replace")
+            if query == "No input detected":
+                continue
+
+            route = resolve(query.lower(), None)
+            # A compound query counts as a use of each of its commands
+            routes = route.call.args[0] if route.name == COMPOUND else [route]
+            hour = str(int(match.group(2)))
+            for route in routes:
+                _count_route(profile, hour, route)
+
+    _save_profile(profile, profile_file)
+    return profile
+
+def _calibrate_when_quiet(quiet, timeout):
+    """
+    Calibrates the microphone once the assistant has finished talking.
+
+    Calibrating during the greeting would set the speech threshold from the
+    assistant's own voice, and listen() keeps it for LISTEN_RECALIBRATE_SECONDS.
+    The microphone is reserved straight away (the greeting is still playing,
+    so nothing else has it yet), which makes the first listen() wait for this
+    calibration rather than race it. If the greeting is still playing after
+    `timeout` seconds, calibration is left to the first listen().
+    """
+    if not listen.calibrate(blocking=False, after=quiet, timeout=timeout):
+        if quiet is not None and not quiet.is_set():
+            raise TimeoutError("the assistant was still talking")
+        raise RuntimeError("the microphone was already in use")
+
+def plan(profile, now=None):
+    """
+    Chooses what to warm up, based on what is usually used around this time of day.
+
+    The microphone is not part of the plan: warm_up() calibrates it before
+    the profile is even read (see _calibrate_when_quiet()).
+
+    Args:
+        profile (dict): A profile from build_profile().
+        now (datetime.datetime): The current time. Defaults to now.
+
+    Returns:
+        list[tuple[str, callable]]: Named warm-up steps, most useful first.
+    """
+    hour = (now or datetime.datetime.now()).hour
+    # Look at the current hour and the hours either side of it
+    usage = collections.Counter()
+    for h in (hour - 1, hour, hour + 1):
+        usage.update(profile["by_hour"].get(str(h % 24), {}))
+
+    steps = []
+    for command, _ in usage.most_common():
+        if command in _MUSIC_COMMANDS and not any(name == "spotify" for name, _ in steps):
+            # Refreshes the token and resolves the most played songs into the song cache
+            top_songs = [song for song, _ in collections.Counter(profile["songs"]).most_common(5)]
+            steps.append(("spotify", lambda: cmd.warm_song_cache(top_songs)))
+        elif command == "get_weather":
+            for city, _ in collections.Counter(profile["cities"]).most_common(2):
+                steps.append((f"weather: {city}", lambda city=city: cmd.get_weather(city)))
+        elif command == "get_news":
+            # get_news() is a generator, so it only fetches (and caches) when consumed
+            steps.append(("news", lambda: list(cmd.get_news())))
+    return steps
+
+def _run_step(name, step, results):
+    """Runs one warm-up step and records how long it took."""
+    started = time.monotonic()
+    try:
+        step()
+        results[name] = f"{time.monotonic() - started:.2f}s"
+    except Exception as e:
+        results[name] = f"failed ({e})"
+
+def warm_up(budget=WARMUP_TIME_BUDGET, quiet=None):
+    """
+    Builds the usage profile and runs the warm-up steps within a time budget.
+
+    The steps run concurrently. Any step still running when the budget runs
+    out is abandoned (it carries on in the background but is not waited for).
+
+    Args:
+        budget (float): Seconds to spend warming up.
+        quiet (threading.Event): Set once the assistant has stopped talking
+            (see _calibrate_when_quiet()).
+
+    Returns:
+        dict: How long each finished step took, keyed by step name.
+    """
+    started = time.monotonic()
+    deadline = started + budget
+    results = {}
+    # Calibrating the microphone helps every session, so it starts first,
+    # before reading the history can delay it past the end of the greeting
+    threads = [threading.Thread(target=_run_step, daemon=True,
+                                args=("microphone", lambda: _calibrate_when_quiet(quiet, budget), results))]
+    threads[0].start()
+    try:
+        profile = build_profile(deadline=deadline)
+    except Exception as e:
+        logging.warning(f"Warm-up could not read the usage history: {e}")
+        profile = _empty_profile()
+
+    for name, step in plan(profile):
+        thread = threading.Thread(target=_run_step, args=(name, step, results), daemon=True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join(max(0, deadline - time.monotonic()))
+
+    logging.info(f"Warm-up finished in {time.monotonic() - started:.2f}s: {dict(results)}")
+    return results
+
+def start(quiet=None):
+    """
+    Starts the warm-up in a background thread and returns immediately.
+
+    Args:
+        quiet (threading.Event): Set once the assistant has stopped talking,
+            so the microphone isn't calibrated on its own voice.
+    """
+    thread = threading.Thread(target=warm_up, kwargs={"quiet": quiet}, daemon=True)
+    thread.start()
+    return thread